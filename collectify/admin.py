@@ -1,10 +1,58 @@
 from django.contrib import admin
 
 from .models import CarHasColor, Color, Car, User
+from .pagination import EstimatedCountPaginator
 
 
-# Register your models here.
-admin.site.register(User)
-admin.site.register(Car)
-admin.site.register(Color)
-admin.site.register(CarHasColor)
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows:
+    the page count is estimated and the unfiltered total is not counted.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search by primary key when the search term is a number
+        """
+        if search_term.strip().isdigit():
+            return queryset.filter(pk=int(search_term)), False
+
+        return super().get_search_results(request, queryset, search_term)
+
+
+class CarHasColorInline(admin.TabularInline):
+    model = CarHasColor
+    autocomplete_fields = ['color']
+    extra = 0
+
+
+@admin.register(Color)
+class ColorAdmin(LargeTableAdmin):
+    list_display = ['id', 'name']
+    search_fields = ['name']
+
+
+@admin.register(Car)
+class CarAdmin(LargeTableAdmin):
+    list_display = ['id', 'name']
+    search_fields = ['name']
+    inlines = [CarHasColorInline]
+
+
+@admin.register(CarHasColor)
+class CarHasColorAdmin(LargeTableAdmin):
+    list_display = ['id', 'car', 'color']
+    list_select_related = ['car', 'color']
+    autocomplete_fields = ['car', 'color']
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin):
+    list_display = ['id', 'firstname', 'lastname', 'date_of_birth', 'has_driver_licence', 'car', 'color']
+    list_select_related = ['car', 'color']
+    list_filter = ['has_driver_licence']
+    autocomplete_fields = ['car', 'color']
+    search_fields = ['^lastname', '^firstname']
@@ -0,0 +1,53 @@
+"""
+Retention and sampling of the API logs stored by drf-api-logger.
+
+Successful GET requests are the bulk of the logs and rarely read, so only a
+sample of them is stored (COLLECTIFY_API_LOG_GET_SAMPLE_RATE), through the
+DRF_API_LOGGER_POLICY_FUNC hook. Errors and writes are always stored. Logs
+older than COLLECTIFY_API_LOG_RETENTION_DAYS are deleted in batches by
+`manage.py prune_api_logs`, which reads them from an index on added_on.
+"""
+
+import random
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+
+# Index of the log timestamp, read by prune_api_logs and the admin ordering.
+API_LOG_INDEX = 'CREATE INDEX IF NOT EXISTS drf_api_logs_added_on ON drf_api_logs (added_on)'
+
+
+def get_api_log_model():
+    """
+    Return the model of the API logs, or None when they are not stored in the database
+    """
+    try:
+        return apps.get_model('drf_api_logger', 'APILogsModel')
+    except LookupError:
+        return None
+
+
+def logging_policy(context):
+    """
+    drf-api-logger policy storing a sample of the successful GET requests
+    """
+    sample_rate = getattr(settings, 'COLLECTIFY_API_LOG_GET_SAMPLE_RATE', 1.0)
+
+    if context['method'] == 'GET' and context['status_class'] in ('2xx', '3xx') and random.random() >= sample_rate:
+        return {'log': False, 'reason': 'sampled'}
+
+    return None
+
+
+def create_api_log_index(using='default', **kwargs):
+    """
+    post_migrate receiver creating the index of the log timestamp, which drf-api-logger does not declare
+    """
+    connection = connections[using]
+    if 'drf_api_logs' not in connection.introspection.table_names():
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(API_LOG_INDEX)
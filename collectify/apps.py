@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 
 class CollectifyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'collectify'
+
+    def ready(self):
+        from . import apilogs, changes, schema, signals  # noqa: F401
+
+        pre_migrate.connect(schema.check_duplicate_car_colors, sender=self)
+        post_migrate.connect(schema.create_postgresql_objects, sender=self)
+        post_migrate.connect(apilogs.create_api_log_index, sender=self)
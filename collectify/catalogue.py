@@ -0,0 +1,191 @@
+"""
+Snapshot of all the cars, with their colors, and all the colors, served by /catalogue/.
+
+Every process keeps the snapshot in memory: the JSON of every car and color,
+the body joining them, its gzip version and their ETags. Reads only check
+for new car and color changes in the change feed (see collectify.changes)
+once every COLLECTIFY_CATALOGUE_CHECK_INTERVAL seconds, and only the cars and
+colors they name are read and serialized again. A read is otherwise the
+write of a prepared buffer, or a 304 when the client has the current ETag.
+The version and ETag of the snapshot are the hash of its content.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from .changes import get_changes_after
+from .metrics import record_cache_lookup
+from .models import Car, Color
+from .serializers import CarSerializer, ColorSerializer
+
+
+# Seconds during which the snapshot is served without checking for changes.
+DEFAULT_CHECK_INTERVAL = 1
+
+# Above this number of changes, the snapshot is built again from scratch.
+MAX_INCREMENTAL_CHANGES = 10000
+
+CATALOGUE_MODELS = {
+    'car': (Car.objects.prefetch_related('colors'), CarSerializer),
+    'color': (Color.objects.all(), ColorSerializer),
+}
+
+
+def encode(data):
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class Snapshot:
+    """
+    Encoded catalogue, immutable once built.
+    Its version is the hash of its content, so every process serves the same catalogue with the same ETag.
+    """
+
+    def __init__(self, items):
+        cars = b','.join(items['car'][object_id] for object_id in sorted(items['car']))
+        colors = b','.join(items['color'][object_id] for object_id in sorted(items['color']))
+        self.version = hashlib.sha256(b'%b\n%b' % (cars, colors)).hexdigest()[:32]
+
+        self.body = b'{"version":"%b","cars":[%b],"colors":[%b]}' % (self.version.encode(), cars, colors)
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = f'"{self.version}"'
+        self.gzip_etag = f'"{self.version}-gzip"'
+
+
+class Catalogue:
+    """
+    Snapshot of the catalogue of the process, brought up to date by the reads
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.items = None
+            self.snapshot = None
+            # Position of the last change read from the feed.
+            self.position = (0, 0)
+            self.checked_at = 0
+
+    def is_stale(self):
+        interval = getattr(settings, 'COLLECTIFY_CATALOGUE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+        return time.monotonic() - self.checked_at >= interval
+
+    def get_snapshot(self):
+        """
+        Return the current snapshot, after applying the changes written since the last check
+        """
+        if self.snapshot is not None and not self.is_stale():
+            record_cache_lookup('catalogue', hits=1)
+            return self.snapshot
+
+        # A single thread updates the snapshot, the others serve the current one meanwhile.
+        if not self.lock.acquire(blocking=self.snapshot is None):
+            record_cache_lookup('catalogue', hits=1)
+            return self.snapshot
+
+        try:
+            # A snapshot built or changed by the check is a miss.
+            snapshot = self.snapshot
+            if self.snapshot is None or self.is_stale():
+                checked_at = time.monotonic()
+                self.update()
+                self.checked_at = checked_at
+
+            record_cache_lookup('catalogue', hits=int(self.snapshot is snapshot), misses=int(self.snapshot is not snapshot))
+            return self.snapshot
+        finally:
+            self.lock.release()
+
+    def get_last_position(self):
+        last_change = get_changes_after(*self.position).last()
+        return (last_change.transaction_id, last_change.id) if last_change else self.position
+
+    def update(self):
+        """
+        Serialize the whole catalogue, or again the cars and colors changed since the last update
+        """
+        # The position is read first: changes written meanwhile are applied again by the next update.
+        last_position = self.get_last_position()
+
+        if self.snapshot is None:
+            self.items = {name: self.serialize(name) for name in CATALOGUE_MODELS}
+            self.snapshot = Snapshot(self.items)
+            self.position = last_position
+            return
+
+        changes = list(
+            get_changes_after(*self.position)
+            .filter(model__in=CATALOGUE_MODELS)
+            .values_list('model', 'object_id')[:MAX_INCREMENTAL_CHANGES + 1]
+        )
+        self.position = last_position
+
+        if len(changes) > MAX_INCREMENTAL_CHANGES:
+            self.snapshot = None
+            self.update()
+            return
+
+        changed_ids = {name: set() for name in CATALOGUE_MODELS}
+        for name, object_id in changes:
+            changed_ids[name].add(object_id)
+
+        for name, object_ids in changed_ids.items():
+            if object_ids:
+                # Deleted objects are missing from the serialized ones.
+                items = self.items[name]
+                for object_id in object_ids:
+                    items.pop(object_id, None)
+                items.update(self.serialize(name, object_ids))
+
+        if changes:
+            self.snapshot = Snapshot(self.items)
+
+    def serialize(self, name, object_ids=None):
+        """
+        Return the encoded representations of the objects of a catalogue model, by id
+        """
+        queryset, serializer_class = CATALOGUE_MODELS[name]
+        if object_ids is not None:
+            queryset = queryset.filter(id__in=object_ids)
+
+        return {item['id']: encode(item) for item in serializer_class(queryset.order_by('id'), many=True).data}
+
+
+catalogue = Catalogue()
+
+
+class CatalogueView(APIView):
+    """
+    Return all the cars with their colors and all the colors, with their version, as prepared JSON
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        snapshot = catalogue.get_snapshot()
+        use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        etag = snapshot.gzip_etag if use_gzip else snapshot.etag
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if snapshot.etag in if_none_match or snapshot.gzip_etag in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(snapshot.gzip_body if use_gzip else snapshot.body, content_type='application/json')
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
@@ -0,0 +1,131 @@
+"""
+Record the saves and deletions of users, cars and colors for the change feed.
+
+Every write adds a Change row in the same transaction. The feed reads them by
+(transaction_id, id): on PostgreSQL, transaction_id is the id of the writing
+transaction and only the rows of transactions older than every running one
+are read, so a transaction committing late cannot be skipped by a cursor.
+Other backends serialize their writes and read the rows by id.
+
+Changes are also sent to the clients subscribed to the event stream (see collectify.events).
+"""
+
+import contextlib
+import threading
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .events import send_event
+from .models import Change, Color, Car, User
+
+
+# Models of the change feed.
+FEED_MODELS = [User, Car, Color]
+
+_pending = threading.local()
+
+
+def record_changes(model, ids, action=Change.SAVE):
+    """
+    Record the save or deletion of objects, now or when the current change_batch() block exits
+    """
+    name = model._meta.model_name
+    pending = getattr(_pending, 'changes', None)
+
+    if pending is None:
+        changes = Change.objects.bulk_create([Change(model=name, object_id=object_id, action=action) for object_id in ids])
+        if changes:
+            send_event(name, action, [change.object_id for change in changes])
+        return
+
+    for object_id in ids:
+        # A deletion is not overwritten by a later save of the same object.
+        if pending.get((name, object_id)) != Change.DELETE:
+            pending[(name, object_id)] = action
+
+
+def record_queryset_changes(queryset, action=Change.SAVE):
+    """
+    Record the save or deletion of the objects of a queryset with a single INSERT ... SELECT
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.values('id').query.sql_with_params()
+    changed_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Change._meta.db_table} (model, object_id, action, transaction_id, changed_at) '
+            f'SELECT %s, changed.id, %s, 0, %s FROM ({sql}) changed',
+            [queryset.model._meta.model_name, action, changed_at, *params],
+        )
+
+    send_event(queryset.model._meta.model_name, action, using=queryset.db)
+
+
+@contextlib.contextmanager
+def change_batch():
+    """
+    Collect the changes recorded in the block and insert them at once
+    """
+    if getattr(_pending, 'changes', None) is not None:
+        yield
+        return
+
+    _pending.changes = {}
+    try:
+        yield
+        changes = _pending.changes
+    finally:
+        _pending.changes = None
+
+    Change.objects.bulk_create([
+        Change(model=name, object_id=object_id, action=action) for (name, object_id), action in changes.items()
+    ])
+
+    events = {}
+    for (name, object_id), action in changes.items():
+        events.setdefault((name, action), []).append(object_id)
+    for (name, action), ids in events.items():
+        send_event(name, action, ids)
+
+
+def get_committed_position():
+    """
+    Return an expression of the transaction ids whose changes can be read, None when every change can
+    """
+    if connections[Change.objects.db].vendor != 'postgresql':
+        return None
+
+    return RawSQL('txid_snapshot_xmin(txid_current_snapshot())', [])
+
+
+def get_changes_after(transaction_id=0, change_id=0):
+    """
+    Return the committed changes after a position of the feed, in commit order
+    """
+    changes = Change.objects.filter(transaction_id__gte=transaction_id).exclude(transaction_id=transaction_id, id__lte=change_id)
+
+    committed_position = get_committed_position()
+    if committed_position is not None:
+        changes = changes.filter(transaction_id__lt=committed_position)
+
+    return changes.order_by('transaction_id', 'id')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Car)
+@receiver(post_save, sender=Color)
+def record_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_changes(sender, [instance.id])
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Car)
+@receiver(post_delete, sender=Color)
+def record_deletion(sender, instance, **kwargs):
+    record_changes(sender, [instance.id], Change.DELETE)
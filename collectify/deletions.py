@@ -0,0 +1,101 @@
+"""
+Delete cars and colors with their dependants in bounded batches.
+
+Deleting a popular car or color cascades to thousands of users and links,
+which Django collects and deletes in one transaction. Deletions requested
+with ?async=true are run as "delete" jobs instead, which delete the
+dependants batch by batch, each in its own short transaction, before
+deleting the object itself.
+"""
+
+from django.db import models, transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from .changes import change_batch
+from .jobs import enqueue, report_progress
+from .models import CarHasColor, Color, Car, Job
+from .signals import color_list_refresh
+
+
+# Models whose objects can be deleted in the background, by name.
+DELETABLE_MODELS = {'car': Car, 'color': Color}
+
+# Rows deleted per transaction.
+BATCH_SIZE = 1000
+
+
+def get_cascades(model):
+    """
+    Return the (model, field name) of the foreign keys deleting their rows with an object of model
+    """
+    cascades = [
+        (relation.related_model, relation.field.name)
+        for relation in model._meta.related_objects
+        if relation.one_to_many and getattr(relation, 'on_delete', None) is models.CASCADE
+    ]
+    # Users first, deleting the car colors they still use would remove them from the users.
+    return sorted(cascades, key=lambda cascade: cascade[0] is CarHasColor)
+
+
+def count_dependants(model, object_id):
+    return sum(
+        related_model.objects.filter(**{field_name: object_id}).count()
+        for related_model, field_name in get_cascades(model)
+    )
+
+
+def run_deletion(job):
+    """
+    Job handler deleting the dependants of an object given as {"model": ..., "id": ...} in batches, then the object
+    """
+    model = DELETABLE_MODELS[job.payload['model']]
+    object_id = job.payload['id']
+    batch_size = job.payload.get('batch_size', BATCH_SIZE)
+    deleted = job.progress.get('deleted', 0)
+
+    # The dependants and the object itself.
+    report_progress(job, deleted=deleted, total=deleted + count_dependants(model, object_id) + 1)
+
+    for related_model, field_name in get_cascades(model):
+        dependants = related_model.objects.filter(**{field_name: object_id})
+
+        while True:
+            with transaction.atomic(), change_batch(), color_list_refresh():
+                ids = list(dependants.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+
+                deleted += related_model.objects.filter(id__in=ids).delete()[0]
+
+            report_progress(job, deleted=deleted)
+
+    with transaction.atomic(), change_batch(), color_list_refresh():
+        deleted += model.objects.filter(id=object_id).delete()[0]
+
+    report_progress(job, deleted=deleted)
+    return {'deleted': deleted}
+
+
+class AsyncDestroyMixin:
+    """
+    Delete objects in the background with DELETE ...?async=true.
+    The response is a 202 with the deletion job, whose progress is read from /jobs/{id}/.
+    """
+
+    def destroy(self, request, *args, **kwargs):
+        if request.query_params.get('async', '').lower() not in ('1', 'true'):
+            return super().destroy(request, *args, **kwargs)
+
+        instance = self.get_object()
+        name = instance._meta.model_name
+        job = (
+            Job.objects
+            .filter(kind='delete', payload__model=name, payload__id=instance.id, status__in=[Job.PENDING, Job.RUNNING])
+            .first()
+        ) or enqueue('delete', {'model': name, 'id': instance.id})
+
+        url = reverse('job-detail', args=[job.id], request=request)
+        data = {'id': job.id, 'status': job.status, 'url': url}
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
@@ -0,0 +1,282 @@
+"""
+Push the saves and deletions of users, cars and colors to subscribed clients.
+
+Changes are sent to a broker when their transaction commits, and the broker
+fans them out to the Server-Sent Events streams of the process. The broker is
+set by COLLECTIFY_EVENT_BROKER:
+
+    COLLECTIFY_EVENT_BROKER = {
+        'BACKEND': 'collectify.events.PostgresBroker',
+        'OPTIONS': {'channel': 'collectify_events'},
+    }
+
+LocalBroker only reaches the streams of the process handling the write, so it
+fits a single ASGI process. PostgresBroker goes through LISTEN/NOTIFY and
+reaches the streams of every process, e.g. events served by an ASGI process
+for writes handled by the gunicorn WSGI workers. It cannot know whether other
+processes listen, so every write sends a NOTIFY: only set it when events are
+served.
+
+Events carry the ids of at most MAX_EVENT_IDS objects, which keeps their
+NOTIFY payload under the 8000 bytes allowed by PostgreSQL. The events of
+larger writes come without ids, like bulk writes.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import select
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two comments keeping idle streams open through proxies.
+HEARTBEAT_INTERVAL = 15
+
+# Ids sent with an event at most, beyond which the ids are left out.
+MAX_EVENT_IDS = 100
+
+
+class Subscription:
+    """
+    Queue of the events of a stream, fed from any thread.
+    A subscription whose queue is full is marked as overflowed: its client missed
+    events and must synchronise again from the change feed.
+    """
+
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def push(self, event):
+        self.loop.call_soon_threadsafe(self.put, event)
+
+
+class LocalBroker:
+    """
+    Broker of the current process only
+    """
+
+    def __init__(self, queue_size=1000):
+        self.queue_size = queue_size
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self):
+        """
+        Return a subscription to the events, to be called from the event loop of the stream
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def dispatch(self, event):
+        """
+        Push an event to the subscriptions of the process
+        """
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def send(self, event, using='default'):
+        """
+        Dispatch an event when the current transaction commits
+        """
+        if self.subscriptions:
+            transaction.on_commit(functools.partial(self.dispatch, event), using=using)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Broker sending events with NOTIFY in the writing transaction, delivered when it commits.
+    Every process listens to the channel with a connection of its own thread, started by the first subscription.
+    """
+
+    def __init__(self, channel='collectify_events', queue_size=1000):
+        super().__init__(queue_size)
+        self.channel = channel
+        self.listener = None
+
+    def send(self, event, using='default'):
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(event)])
+
+    def subscribe(self):
+        with self.lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self.listen, name='collectify-events', daemon=True)
+                self.listener.start()
+
+        return super().subscribe()
+
+    def listen(self):
+        """
+        Dispatch the notifications of the channel, reconnecting after errors
+        """
+        while True:
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception('Listening to "%s" failed, reconnecting.', self.channel)
+                time.sleep(1)
+
+    def listen_once(self):
+        database = connections['default']
+        connection = database.get_new_connection(database.get_connection_params())
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+
+            while True:
+                if select.select([connection], [], [], HEARTBEAT_INTERVAL) == ([], [], []):
+                    continue
+
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    self.dispatch(json.loads(notification.payload))
+        finally:
+            connection.close()
+
+
+@functools.lru_cache(maxsize=None)
+def get_broker():
+    """
+    Return the broker set by COLLECTIFY_EVENT_BROKER
+    """
+    config = getattr(settings, 'COLLECTIFY_EVENT_BROKER', {})
+    backend = import_string(config.get('BACKEND', 'collectify.events.LocalBroker'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    if setting == 'COLLECTIFY_EVENT_BROKER':
+        get_broker.cache_clear()
+
+
+def send_event(model, action, ids=None, using='default'):
+    """
+    Send the save or deletion of objects of a model, given by its name, to the subscribed clients.
+    ids is None when the changed objects are not known or too many, clients then read them from the change feed.
+    """
+    if ids is not None and len(ids) > MAX_EVENT_IDS:
+        ids = None
+
+    get_broker().send({'model': model, 'action': action, 'ids': ids}, using=using)
+
+
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+@sync_to_async
+def get_token_user(key):
+    """
+    Return the active user of a token, or None
+    """
+    token = Token.objects.select_related('user').filter(key=key).first()
+    return token.user if token and token.user.is_active else None
+
+
+class EventStream:
+    """
+    ASGI application streaming the events as Server-Sent Events.
+
+    Clients authenticate with an "Authorization: Token <key>" header, or a
+    "token" query parameter since browsers' EventSource cannot set headers.
+    "models" restricts the stream to some models, e.g. ?models=car,color.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, b'Method not allowed.')
+
+        query = parse_qs(scope['query_string'].decode())
+        headers = dict(scope['headers'])
+        authorization = headers.get(b'authorization', b'').decode().split()
+        key = authorization[1] if len(authorization) == 2 and authorization[0] == 'Token' else query.get('token', [''])[0]
+
+        if not key or await get_token_user(key) is None:
+            return await self.respond(send, 401, b'Invalid token.')
+
+        models = {name for value in query.get('models', []) for name in value.split(',') if name}
+        broker = get_broker()
+        subscription = broker.subscribe()
+
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+            await self.stream(subscription, models, receive, send)
+        finally:
+            broker.unsubscribe(subscription)
+
+    async def stream(self, subscription, models, receive, send):
+        """
+        Send the events of a subscription until the client disconnects
+        """
+        disconnect = asyncio.ensure_future(self.wait_disconnect(receive))
+
+        try:
+            while not disconnect.done():
+                event = asyncio.ensure_future(subscription.queue.get())
+                await asyncio.wait([event, disconnect], timeout=HEARTBEAT_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+
+                if not event.done():
+                    event.cancel()
+                    if not disconnect.done():
+                        await send({'type': 'http.response.body', 'body': b': heartbeat\n\n', 'more_body': True})
+                    continue
+
+                if subscription.overflowed:
+                    await send({'type': 'http.response.body', 'body': format_event('overflow', {}), 'more_body': False})
+                    return
+
+                data = event.result()
+                if not models or data['model'] in models:
+                    await send({'type': 'http.response.body', 'body': format_event(data['action'], data), 'more_body': True})
+        finally:
+            disconnect.cancel()
+
+    async def wait_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def respond(self, send, status, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': body})
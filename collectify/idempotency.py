@@ -0,0 +1,124 @@
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+# Time during which the response of a request is replayed to its retries, in seconds.
+DEFAULT_TTL = 24 * 60 * 60
+
+# Time after which the key of a request still running can be claimed by a retry, in seconds.
+# It outlives the requests of the workers (the gunicorn timeout), so that it only expires for dead requests.
+DEFAULT_LEASE = 60
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still running.'
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used by a different request.'
+    default_code = 'idempotency_key_mismatch'
+
+
+def get_fingerprint(request):
+    """
+    Return a hash identifying the method, path and data of a request
+    """
+    data = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path} {data}'.encode()).hexdigest()
+
+
+class IdempotentMixin:
+    """
+    Run create and update requests once per Idempotency-Key header.
+
+    The first request claims the key, its response is stored and replayed to
+    the retries with the same key. Concurrent retries get a 409 while the first
+    request runs, and a key reused for another request gets a 422. A running
+    request holds its key for a short lease only, so that the retries of a
+    request whose worker died can claim it.
+    """
+    idempotency_header = 'Idempotency-Key'
+
+    def create(self, request, *args, **kwargs):
+        return self.run_once(super().create, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self.run_once(super().update, request, *args, **kwargs)
+
+    def claim_idempotency_key(self, request, key, fingerprint):
+        """
+        Create the key of the request, or return the response stored for it
+        """
+        now = timezone.now()
+        lease = getattr(settings, 'COLLECTIFY_IDEMPOTENCY_LEASE', DEFAULT_LEASE)
+
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + datetime.timedelta(seconds=lease),
+                ), None
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+
+        if record is None or record.expires_at <= now:
+            # The key expired, its request failed or its lease ended, claim it again.
+            IdempotencyKey.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+            return self.claim_idempotency_key(request, key, fingerprint)
+
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyMismatch()
+
+        if record.status_code is None:
+            raise IdempotencyKeyInUse()
+
+        return None, Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+    def run_once(self, handler, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if not key or not request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({self.idempotency_header: ['This header is too long.']})
+
+        record, stored_response = self.claim_idempotency_key(request, key, get_fingerprint(request))
+        if stored_response is not None:
+            return stored_response
+
+        try:
+            response = handler(request, *args, **kwargs)
+        except Exception:
+            # Release the key so that the request can be retried.
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            # Nothing is stored if a retry claimed the key after the end of the lease.
+            ttl = getattr(settings, 'COLLECTIFY_IDEMPOTENCY_TTL', DEFAULT_TTL)
+            IdempotencyKey.objects.filter(id=record.id).update(
+                status_code=response.status_code,
+                response=response.data,
+                expires_at=timezone.now() + datetime.timedelta(seconds=ttl),
+            )
+
+        return response
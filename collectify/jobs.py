@@ -0,0 +1,172 @@
+"""
+Background jobs stored in the database and run by `manage.py run_workers`.
+
+A job has a kind, whose handler is a function taking the job, and a JSON
+payload. Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so that
+any number of processes share the queue without an external broker. A failed
+job is retried after an exponential backoff until max_attempts. A running job
+is kept alive by a heartbeat of its worker, and taken over by another worker
+once its heartbeat stops, unless it used up its attempts: it then fails, so
+that a job killing its workers is not run forever.
+
+Handlers are set by kind, COLLECTIFY_JOB_HANDLERS adds or replaces some:
+
+    COLLECTIFY_JOB_HANDLERS = {
+        'rebuild_stats': 'stats.jobs.rebuild_stats',
+    }
+"""
+
+import contextlib
+import datetime
+import io
+import threading
+import traceback
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+JOB_HANDLERS = {
+    'delete': 'collectify.deletions.run_deletion',
+    'command': 'collectify.jobs.run_command',
+}
+
+# Management commands that "command" jobs can run.
+JOB_COMMANDS = [
+    'import_collectify', 'export_collectify', 'repair_car_colors', 'prune_idempotency_keys', 'prune_api_logs', 'prune_changes',
+]
+
+# A running job not updated for this long is taken over by another worker.
+STALE_AFTER = datetime.timedelta(minutes=5)
+
+# Seconds between two updates of a running job by its worker.
+HEARTBEAT_INTERVAL = STALE_AFTER.total_seconds() / 5
+
+# Delay before the first retry of a failed job, doubled at every attempt.
+RETRY_DELAY = datetime.timedelta(seconds=10)
+
+
+def get_handler(kind):
+    handlers = dict(JOB_HANDLERS, **getattr(settings, 'COLLECTIFY_JOB_HANDLERS', {}))
+    return import_string(handlers[kind])
+
+
+def enqueue(kind, payload=None, priority=0, max_attempts=3):
+    """
+    Create a pending job
+    """
+    return Job.objects.create(kind=kind, payload=payload or {}, priority=priority, max_attempts=max_attempts)
+
+
+def claim_job():
+    """
+    Mark the next job to run as running and return it, or None.
+    A stale job that used up its attempts, e.g. whose handler kills its worker, fails instead of being taken over.
+    """
+    now = timezone.now()
+    stale = models.Q(status=Job.RUNNING, updated_at__lt=now - STALE_AFTER)
+
+    Job.objects.filter(stale, attempts__gte=models.F('max_attempts')).update(
+        status=Job.FAILED, error='The worker running the job was lost.', updated_at=now,
+    )
+
+    candidates = (
+        Job.objects
+        .filter(models.Q(status=Job.PENDING, run_after__lte=now) | stale & models.Q(attempts__lt=models.F('max_attempts')))
+        .order_by('-priority', 'id')
+    )
+
+    with transaction.atomic():
+        job = candidates.select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+
+        # Backends without row locks rely on this conditional update to claim the job once.
+        claimed = Job.objects.filter(id=job.id, status=job.status, updated_at=job.updated_at).update(
+            status=Job.RUNNING, attempts=models.F('attempts') + 1, updated_at=timezone.now(),
+        )
+
+    if not claimed:
+        return None
+
+    job.refresh_from_db()
+    return job
+
+
+def report_progress(job, **progress):
+    """
+    Save the progress of a running job, which also shows other workers that it is running
+    """
+    job.progress.update(progress)
+    job.save(update_fields=['progress', 'updated_at'])
+
+
+def send_heartbeats(job, stopped):
+    """
+    Update a running job every HEARTBEAT_INTERVAL seconds until stopped, from its own connection
+    """
+    try:
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            Job.objects.filter(id=job.id, status=Job.RUNNING, attempts=job.attempts).update(updated_at=timezone.now())
+    finally:
+        connection.close()
+
+
+@contextlib.contextmanager
+def heartbeat(job):
+    """
+    Keep a job from being taken over while the block runs, whether or not its handler reports its progress
+    """
+    stopped = threading.Event()
+    thread = threading.Thread(target=send_heartbeats, args=(job, stopped), name=f'job-{job.id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job):
+    """
+    Run a claimed job, and schedule its retry if it fails.
+    The outcome is not saved if another worker took the job over meanwhile.
+    """
+    try:
+        with heartbeat(job):
+            job.result = get_handler(job.kind)(job)
+    except Exception:
+        job.error = traceback.format_exc()
+
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+        job.error = ''
+
+    # Every claim increments attempts, which identifies the worker running the job.
+    job.updated_at = timezone.now()
+    fields = ['status', 'run_after', 'result', 'error', 'updated_at']
+    Job.objects.filter(id=job.id, attempts=job.attempts).update(**{name: getattr(job, name) for name in fields})
+    return job
+
+
+def run_command(job):
+    """
+    Run a management command given as {"name": ..., "args": [...]}, and return the end of its output
+    """
+    name = job.payload['name']
+    if name not in JOB_COMMANDS:
+        raise ValueError(f'The "{name}" command cannot run as a job.')
+
+    output = io.StringIO()
+    call_command(name, *job.payload.get('args', []), stdout=output, stderr=output)
+    return {'output': output.getvalue()[-10000:]}
@@ -0,0 +1,127 @@
+"""
+Structured logging that never blocks the request path on file I/O.
+
+Records are tagged with the id of the current request, formatted as JSON
+lines by the thread logging them, and put on a queue. A QueueListener thread
+of every process writes them to stderr, or to a file of the process rotated by
+size or by time. The access log of every request is written by
+MetricsMiddleware to the "collectify.access" logger, with its latency and
+query count.
+"""
+
+import atexit
+import contextvars
+import datetime
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+
+# Id of the request handled by the current thread or task.
+request_id = contextvars.ContextVar('request_id', default=None)
+
+# Attributes of every log record, the others come from the "extra" of the logging call.
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Add the id of the current request to the records
+    """
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as JSON lines, with the fields given in the "extra" of the logging call
+    """
+
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        data.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(data, default=str)
+
+
+def stop_listener(listener):
+    """
+    Write the queued records and stop the listener thread, if it runs
+    """
+    if listener._thread is not None:
+        listener.stop()
+
+
+def restart_listener(listener, get_target):
+    """
+    Restart the listener thread, which does not run in a forked process, with a target of the process
+    """
+    if listener._thread is not None:
+        # Records queued before the fork are written by the parent.
+        while not listener.queue.empty():
+            listener.queue.get_nowait()
+
+        for target in listener.handlers:
+            target.close()
+
+        listener.handlers = (get_target(),)
+        listener._thread = None
+        listener.start()
+
+
+def get_target(filename, rotation, max_bytes, when, backup_count):
+    """
+    Return the handler writing the formatted records of the current process
+    """
+    if not filename:
+        target = logging.StreamHandler(sys.stderr)
+
+    else:
+        filename = str(filename).format(pid=os.getpid())
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+
+        if rotation == 'time':
+            target = logging.handlers.TimedRotatingFileHandler(filename, when=when, backupCount=backup_count, delay=True)
+        else:
+            target = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+
+    # Records are formatted by the queue handler, the target only receives their message.
+    target.setFormatter(logging.Formatter('%(message)s'))
+    return target
+
+
+def queue_handler(filename=None, rotation='size', max_bytes=50 * 1024 * 1024, when='midnight', backup_count=5):
+    """
+    Return a handler putting records on a queue written to stderr, or to filename, by a listener thread.
+
+    rotation is "size" (files of max_bytes) or "time" (a file every "when", see
+    TimedRotatingFileHandler), backup_count files are kept. "{pid}" in filename
+    is replaced by the process id, so that the workers do not rotate the same file,
+    forked processes included.
+    """
+    target_factory = functools.partial(get_target, filename, rotation, max_bytes, when, backup_count)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, target_factory())
+    listener.start()
+    atexit.register(stop_listener, listener)
+    os.register_at_fork(after_in_child=functools.partial(restart_listener, listener, target_factory))
+
+    handler = logging.handlers.QueueHandler(records)
+    handler.listener = listener
+    return handler
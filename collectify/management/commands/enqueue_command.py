@@ -0,0 +1,23 @@
+import argparse
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...jobs import JOB_COMMANDS, enqueue
+
+
+class Command(BaseCommand):
+    help = 'Run a management command in the background, as a job of the run_workers processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help=f'Command among {", ".join(JOB_COMMANDS)}.')
+        parser.add_argument('command_args', nargs=argparse.REMAINDER, metavar='args', help='Arguments of the command.')
+        parser.add_argument('--priority', type=int, default=0, help='Jobs of higher priority run first.')
+        parser.add_argument('--max-attempts', type=int, default=1, help='Runs of the command before it is failed.')
+
+    def handle(self, *args, **options):
+        if options['name'] not in JOB_COMMANDS:
+            raise CommandError(f'The "{options["name"]}" command cannot run as a job.')
+
+        job = enqueue('command', {'name': options['name'], 'args': options['command_args']},
+                      priority=options['priority'], max_attempts=options['max_attempts'])
+        self.stdout.write(self.style.SUCCESS(f'Job {job.id} enqueued.'))
@@ -0,0 +1,188 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Max, Min
+
+from ...models import CarHasColor, Color, Car, User
+
+
+# Exported tables: model and columns with their Parquet type.
+TABLES = {
+    'colors': (Color, [('id', 'int64'), ('name', 'string')]),
+    'cars': (Car, [('id', 'int64'), ('name', 'string')]),
+    'car_colors': (CarHasColor, [('id', 'int64'), ('car_id', 'int64'), ('color_id', 'int64')]),
+    'users': (User, [
+        ('id', 'int64'),
+        ('firstname', 'string'),
+        ('lastname', 'string'),
+        ('date_of_birth', 'date32'),
+        ('has_driver_licence', 'bool_'),
+        ('car_id', 'int64'),
+        ('color_id', 'int64'),
+    ]),
+}
+
+EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'parquet': 'parquet'}
+
+
+class CsvWriter:
+
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(name for name, _ in columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class NdjsonWriter:
+
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.names = [name for name, _ in columns]
+
+    def write_rows(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.names, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Write every chunk as a row group of a Parquet file, pyarrow is required
+    """
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise CommandError('The parquet format requires pyarrow, install it with "pip install pyarrow".')
+
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(name, getattr(pyarrow, type_name)()) for name, type_name in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in self.schema]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'csv': CsvWriter, 'ndjson': NdjsonWriter, 'parquet': ParquetWriter}
+
+
+def get_id_ranges(model, count):
+    """
+    Split the ids of a table into count contiguous ranges of the same width
+    """
+    bounds = model.objects.aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return [(None, None)]
+
+    first, last = bounds['first'], bounds['last']
+    width = max((last - first + 1) // count, 1)
+    starts = list(range(first, last + 1, width))[:count]
+
+    return [(start, starts[index + 1] - 1 if index + 1 < len(starts) else last) for index, start in enumerate(starts)]
+
+
+def export_range(task):
+    """
+    Export the rows of a table between two ids.
+    Rows are read with a server-side cursor in chunks, so memory does not grow with the table.
+    """
+    table, path, file_format, start, end, chunk_size = task
+    model, columns = TABLES[table]
+
+    queryset = model.objects.order_by('id')
+    if start is not None:
+        queryset = queryset.filter(id__gte=start, id__lte=end)
+    rows = queryset.values_list(*[name for name, _ in columns]).iterator(chunk_size=chunk_size)
+
+    writer = WRITERS[file_format](path, columns)
+    count = 0
+    try:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                writer.write_rows(chunk)
+                count += len(chunk)
+                chunk = []
+
+        if chunk or not count:
+            writer.write_rows(chunk)
+            count += len(chunk)
+    finally:
+        writer.close()
+
+    return path, count
+
+
+class Command(BaseCommand):
+    help = 'Export colors, cars, their colors and users to CSV, NDJSON or Parquet files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='.', help='Directory where the files are written.')
+        parser.add_argument('--format', choices=list(WRITERS), default='csv')
+        parser.add_argument('--tables', default=','.join(TABLES),
+                            help=f'Comma separated list of tables among {", ".join(TABLES)}.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows fetched from the database cursor at once.')
+        parser.add_argument('--ranges', type=int, default=1, help='Split every table into this number of files by id range.')
+        parser.add_argument('--processes', type=int, default=1, help='Number of processes exporting ranges in parallel.')
+
+    def handle(self, *args, **options):
+        tables = [table.strip() for table in options['tables'].split(',') if table.strip()]
+        unknown_tables = [table for table in tables if table not in TABLES]
+        if unknown_tables:
+            raise CommandError(f'Unknown tables: {", ".join(unknown_tables)}.')
+
+        os.makedirs(options['output'], exist_ok=True)
+        extension = EXTENSIONS[options['format']]
+        tasks = []
+
+        for table in tables:
+            model, _ = TABLES[table]
+            ranges = get_id_ranges(model, options['ranges']) if options['ranges'] > 1 else [(None, None)]
+
+            for index, (start, end) in enumerate(ranges, start=1):
+                name = f'{table}.{extension}' if len(ranges) == 1 else f'{table}-{index:04d}.{extension}'
+                path = os.path.join(options['output'], name)
+                tasks.append((table, path, options['format'], start, end, options['chunk_size']))
+
+        start_time = time.monotonic()
+
+        if options['processes'] > 1:
+            # Forked processes must open their own database connections.
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['processes']) as pool:
+                results = pool.imap_unordered(export_range, tasks)
+                self.report(results, start_time)
+        else:
+            self.report(map(export_range, tasks), start_time)
+
+    def report(self, results, start_time):
+        total = 0
+        for path, count in results:
+            total += count
+            self.stdout.write(f'{path}: {count} rows')
+
+        duration = time.monotonic() - start_time
+        self.stdout.write(self.style.SUCCESS(f'{total} rows exported in {duration:.1f}s.'))
@@ -0,0 +1,287 @@
+import csv
+import io
+import itertools
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import serializers
+
+from ...changes import record_changes, record_queryset_changes
+from ...models import CarHasColor, Color, Car, ImportCheckpoint, User
+from ...serializers import UserSerializer, clean_car_and_color, get_car_color_ids
+
+
+# Columns written by the COPY loader, in the order of the generated CSV.
+USER_COPY_COLUMNS = [
+    'firstname', 'lastname', 'date_of_birth', 'has_driver_licence', 'car_id', 'color_id', 'created_at', 'updated_at',
+]
+
+# Separator of color names in the "colors" column of a cars CSV file.
+CSV_COLOR_SEPARATOR = '|'
+
+
+def read_rows(path, file_format):
+    """
+    Yield the rows of a CSV or NDJSON file as dictionaries.
+    Empty CSV cells are left out so that they behave like missing keys.
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            for row in csv.DictReader(source):
+                yield {key: value for key, value in row.items() if value not in ('', None)}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def get_format(path, file_format):
+    """
+    Return the format of a source file, guessed from its extension if not given
+    """
+    if file_format:
+        return file_format
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+
+    raise CommandError(f'Cannot guess the format of "{path}", use --format.')
+
+
+def batched(rows, size):
+    """
+    Split an iterable into lists of at most size items
+    """
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_color_names(row):
+    """
+    Return the color names of a car row.
+    CSV rows hold names separated by "|", NDJSON rows hold a list of names or of {"name": ...} objects.
+    """
+    colors = row.get('colors') or []
+
+    if isinstance(colors, str):
+        colors = colors.split(CSV_COLOR_SEPARATOR)
+
+    names = [color.get('name') if isinstance(color, dict) else color for color in colors]
+    return [name.strip() for name in names if name and name.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Import colors, cars and users from CSV or NDJSON files, in batches that can be resumed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--colors', help='File of colors, with a "name" column.')
+        parser.add_argument('--cars', help='File of cars, with "name" and "colors" (color names) columns.')
+        parser.add_argument('--users', help='File of users, with the fields of the users endpoint.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Format of the files, guessed from their extension by default.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows validated and loaded per transaction.')
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto',
+                            help='Load users with PostgreSQL COPY or with bulk_create, "auto" uses COPY when available.')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows already imported by a previous run.')
+
+    def handle(self, *args, **options):
+        sources = [
+            ('colors', options['colors'], self.import_colors),
+            ('cars', options['cars'], self.import_cars),
+            ('users', options['users'], self.import_users),
+        ]
+        if not any(path for _, path, _ in sources):
+            raise CommandError('Give at least one of --colors, --cars or --users.')
+
+        self.method = self.get_method(options['method'])
+
+        for kind, path, import_batch in sources:
+            if path:
+                self.import_file(kind, path, get_format(path, options['format']), import_batch, options)
+
+    def get_method(self, method):
+        """
+        Return the loader used for users
+        """
+        with connection.cursor() as cursor:
+            copy_available = connection.vendor == 'postgresql' and hasattr(cursor, 'copy_expert')
+
+        if method == 'copy' and not copy_available:
+            raise CommandError('COPY is only available with PostgreSQL and psycopg2.')
+        if method == 'auto':
+            return 'copy' if copy_available else 'bulk'
+
+        return method
+
+    def import_file(self, kind, path, file_format, import_batch, options):
+        """
+        Import a file batch by batch, each batch is saved with its checkpoint in one transaction
+        """
+        source = f'{kind}:{os.path.abspath(path)}'
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+
+        if not options['resume']:
+            checkpoint.rows_read = checkpoint.rows_imported = checkpoint.rows_rejected = 0
+            checkpoint.completed = False
+            checkpoint.save()
+
+        elif checkpoint.completed:
+            self.stdout.write(f'{kind}: already imported from {path}, skipped.')
+            return
+
+        elif checkpoint.rows_read:
+            self.stdout.write(f'{kind}: resuming after {checkpoint.rows_read} rows.')
+
+        rows = itertools.islice(read_rows(path, file_format), checkpoint.rows_read, None)
+        line = checkpoint.rows_read
+        start = time.monotonic()
+        imported = 0
+
+        for batch in batched(rows, options['batch_size']):
+            numbered_batch = list(enumerate(batch, start=line + 1))
+            line += len(batch)
+
+            with transaction.atomic():
+                batch_imported, rejected = import_batch(numbered_batch)
+
+                checkpoint.rows_read += len(batch)
+                checkpoint.rows_imported += batch_imported
+                checkpoint.rows_rejected += len(rejected)
+                checkpoint.save()
+
+            imported += batch_imported
+            for row_number, errors in rejected:
+                self.stderr.write(f'{kind}: row {row_number} rejected: {errors}')
+
+            rate = imported / max(time.monotonic() - start, 1e-6)
+            self.stdout.write(
+                f'{kind}: {checkpoint.rows_read} rows read, {checkpoint.rows_imported} imported, '
+                f'{checkpoint.rows_rejected} rejected ({rate:.0f} rows/s)'
+            )
+
+        checkpoint.completed = True
+        checkpoint.save()
+        self.stdout.write(self.style.SUCCESS(f'{kind}: {checkpoint.rows_imported} rows imported from {path}.'))
+
+    def import_colors(self, numbered_rows):
+        """
+        Create the colors whose name does not exist yet
+        """
+        rejected = []
+        names = {}
+
+        for row_number, row in numbered_rows:
+            name = (row.get('name') or '').strip()
+            if not name:
+                rejected.append((row_number, {'name': ['This field is required.']}))
+            else:
+                names[name] = None
+
+        existing_names = set(Color.objects.filter(name__in=names).values_list('name', flat=True))
+        colors = [Color(name=name) for name in names if name not in existing_names]
+        Color.objects.bulk_create(colors)
+        record_changes(Color, [color.id for color in colors])
+
+        return len(colors), rejected
+
+    def import_cars(self, numbered_rows):
+        """
+        Create cars and link them to their colors, looked up by name
+        """
+        rejected = []
+        valid_rows = []
+
+        color_names = {name for _, row in numbered_rows for name in get_color_names(row)}
+        color_ids = {}
+        for color_id, name in Color.objects.filter(name__in=color_names).order_by('-id').values_list('id', 'name'):
+            color_ids[name] = color_id
+
+        for row_number, row in numbered_rows:
+            name = (row.get('name') or '').strip()
+            names = get_color_names(row)
+            unknown_names = [color_name for color_name in names if color_name not in color_ids]
+
+            if not name:
+                rejected.append((row_number, {'name': ['This field is required.']}))
+            elif unknown_names:
+                rejected.append((row_number, {'colors': [f'Unknown color "{color_name}".' for color_name in unknown_names]}))
+            else:
+                valid_rows.append((name, names))
+
+        cars = Car.objects.bulk_create([
+            Car(name=name, color_list=[{'id': color_ids[color_name], 'name': color_name} for color_name in dict.fromkeys(names)])
+            for name, names in valid_rows
+        ])
+        links = [
+            CarHasColor(car_id=car.id, color_id=color['id'])
+            for car in cars
+            for color in car.color_list
+        ]
+        CarHasColor.objects.bulk_create(links)
+        record_changes(Car, [car.id for car in cars])
+
+        return len(cars), rejected
+
+    def import_users(self, numbered_rows):
+        """
+        Validate users with the rules of the users endpoint and load them
+        """
+        validator = UserSerializer()
+        rejected = []
+        users_data = []
+
+        for row_number, row in numbered_rows:
+            try:
+                users_data.append(validator.run_validation(row))
+            except serializers.ValidationError as error:
+                rejected.append((row_number, error.detail))
+
+        car_ids = {data['car_id'] for data in users_data if data.get('has_driver_licence') and data.get('car_id')}
+        car_color_ids = get_car_color_ids(car_ids) if car_ids else {}
+
+        for data in users_data:
+            clean_car_and_color(data, car_color_ids)
+
+        if self.method == 'copy':
+            self.copy_users(users_data)
+        else:
+            users = User.objects.bulk_create([User(**data) for data in users_data])
+            record_changes(User, [user.id for user in users])
+
+        return len(users_data), rejected
+
+    def copy_users(self, users_data):
+        """
+        Load users with PostgreSQL COPY
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        now = timezone.now()
+
+        for data in users_data:
+            user = User(**data, created_at=now, updated_at=now)
+            writer.writerow([
+                '' if value is None else value
+                for value in (getattr(user, column) for column in USER_COPY_COLUMNS)
+            ])
+
+        buffer.seek(0)
+        columns = ', '.join(USER_COPY_COLUMNS)
+        last_id = User.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {User._meta.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+        # COPY returns no ids: the users created since the last id are recorded, a few concurrent ones may be twice.
+        record_queryset_changes(User.objects.filter(id__gt=last_id))
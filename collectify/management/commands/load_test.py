@@ -0,0 +1,409 @@
+import datetime
+import http.client
+import json
+import math
+import os
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from ...changes import record_changes
+from ...models import CarHasColor, Color, Car, User
+
+
+# End of the last names of the users seeded and created by the command, the only users it writes.
+LOAD_TEST_MARKER = '_load_test'
+
+# Last name of the users created by the write operations, deleted after the run.
+LOAD_TEST_LASTNAME = 'Created' + LOAD_TEST_MARKER
+
+# Accounts of the clients, one token each so that every client has its own throttling buckets.
+LOAD_TEST_ACCOUNT = 'load_test_{}'
+
+FIRSTNAMES = ['Henry', 'Louise', 'Paul', 'Alice', 'Marc', 'Julie', 'Hugo', 'Emma', 'Léo', 'Chloé']
+LASTNAMES = ['Dupont', 'Martin', 'Bernard', 'Durand', 'Petit', 'Moreau', 'Laurent', 'Simon', 'Michel', 'Garcia']
+CAR_NAMES = ['Tesla', 'Renault', 'Peugeot', 'Citroën', 'Fiat', 'Volvo', 'Toyota', 'Mazda', 'Skoda', 'Opel']
+COLOR_NAMES = ['bleu', 'rouge', 'vert', 'noir', 'blanc', 'gris', 'jaune', 'orange', 'violet', 'argent']
+
+DEFAULT_MIX = (
+    'retrieve_user=30,list_users=10,multi_get_users=10,search_users=10,retrieve_car=10,list_cars=5,'
+    'catalogue=5,create_user=10,update_user=10'
+)
+
+
+class Workload:
+    """
+    Requests of the operations of the mix, on the ids of the seeded users and of the cars
+    """
+
+    def __init__(self, user_ids, car_ids):
+        self.user_ids = user_ids
+        self.car_ids = car_ids
+
+    def retrieve_user(self):
+        return 'GET', f'/users/{random.choice(self.user_ids)}/', None
+
+    def list_users(self):
+        return 'GET', f'/users/?page={random.randint(1, 10)}&page_size=100', None
+
+    def multi_get_users(self):
+        ids = ','.join(str(user_id) for user_id in random.sample(self.user_ids, min(20, len(self.user_ids))))
+        return 'GET', f'/users/?ids={ids}', None
+
+    def search_users(self):
+        return 'GET', '/users/?' + urlencode({'search': f'{random.choice(FIRSTNAMES)[:3]} {random.choice(LASTNAMES)}'}), None
+
+    def retrieve_car(self):
+        return 'GET', f'/cars/{random.choice(self.car_ids)}/', None
+
+    def list_cars(self):
+        return 'GET', '/cars/?page=1&page_size=100', None
+
+    def catalogue(self):
+        return 'GET', '/catalogue/', None
+
+    def create_user(self):
+        return 'POST', '/users/', {
+            'firstname': random.choice(FIRSTNAMES),
+            'lastname': LOAD_TEST_LASTNAME,
+            'date_of_birth': '1990-01-25',
+            'has_driver_licence': False,
+        }
+
+    def update_user(self):
+        return 'PATCH', f'/users/{random.choice(self.user_ids)}/', {'firstname': random.choice(FIRSTNAMES)}
+
+
+def get_seeded_users():
+    """
+    Return the users seeded by the command
+    """
+    return User.objects.filter(lastname__endswith=LOAD_TEST_MARKER).exclude(lastname=LOAD_TEST_LASTNAME)
+
+
+def parse_mix(value):
+    """
+    Return the operations and weights of a mix given as "operation=weight,..."
+    """
+    mix = {}
+
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+        if not callable(getattr(Workload, name, None)) or name.startswith('_'):
+            raise CommandError(f'Unknown operation "{name}".')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise CommandError(f'Invalid weight "{weight}" of "{name}".')
+
+    if not any(mix.values()):
+        raise CommandError('Give a positive weight to at least one operation.')
+
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """
+    Return the nearest-rank percentile of sorted values, or None without values
+    """
+    if not sorted_values:
+        return None
+
+    # Rounded first, so that 0.99 of 100 values is the 99th and not the 100th.
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize_latencies(results):
+    """
+    Return the number, latency percentiles in milliseconds and error rate of results.
+    Results are (operation, status, seconds), status is 0 when the request failed without a response.
+    """
+    latencies = sorted(seconds * 1000 for _, _, seconds in results)
+    errors = sum(1 for _, status, _ in results if not 200 <= status < 400)
+
+    return {
+        'requests': len(results),
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1] if latencies else None,
+        'error_rate': errors / len(results) if results else 0,
+    }
+
+
+def summarize(concurrency, duration, results):
+    """
+    Return the throughput, latencies, error rate and statuses of the results of a level, and by operation
+    """
+    by_operation = {}
+    for result in results:
+        by_operation.setdefault(result[0], []).append(result)
+
+    return {
+        'concurrency': concurrency,
+        'throughput': len(results) / duration if duration else 0,
+        **summarize_latencies(results),
+        'statuses': dict(sorted(Counter(status for _, status, _ in results).items())),
+        'operations': {operation: summarize_latencies(by_operation[operation]) for operation in sorted(by_operation)},
+    }
+
+
+def run_client(url, token, workload, operations, weights, stop_at, results):
+    """
+    Send requests of the mix on a keep-alive connection until stop_at
+    """
+    address = urlsplit(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port, timeout=30)
+    headers = {'Authorization': f'Token {token}', 'Accept': 'application/json', 'Content-Type': 'application/json'}
+
+    while time.monotonic() < stop_at:
+        operation = random.choices(operations, weights)[0]
+        method, path, data = getattr(workload, operation)()
+        body = json.dumps(data) if data is not None else None
+
+        start = time.perf_counter()
+        try:
+            connection.request(method, address.path.rstrip('/') + path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # The connection is opened again by the next request.
+            connection.close()
+            status = 0
+
+        results.append((operation, status, time.perf_counter() - start))
+
+    connection.close()
+
+
+def run_level(url, tokens, workload, mix, concurrency, duration):
+    """
+    Run concurrency clients for duration seconds and return the summary of their requests
+    """
+    operations, weights = list(mix), list(mix.values())
+    stop_at = time.monotonic() + duration
+    results = []
+
+    clients = [
+        threading.Thread(
+            target=run_client,
+            args=(url, tokens[index % len(tokens)], workload, operations, weights, stop_at, results),
+            daemon=True,
+        )
+        for index in range(concurrency)
+    ]
+    start = time.monotonic()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    return summarize(concurrency, time.monotonic() - start, results)
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the API with gunicorn against a seeded database, replay a mix of reads and writes '
+        'at increasing concurrency levels and report throughput, latency percentiles and error rates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Load an API already running at this URL instead of starting gunicorn.')
+        parser.add_argument('--port', type=int, default=8765, help='Port of the gunicorn server started by the command.')
+        parser.add_argument('--workers', type=int, default=4, help='Gunicorn workers.')
+        parser.add_argument('--gunicorn-args', default='', help='Other gunicorn options, e.g. "--threads 4".')
+        parser.add_argument('--seed-users', type=int, default=10000, help='Load test users the database must hold, created if missing.')
+        parser.add_argument('--seed-cars', type=int, default=100, help='Cars the database must hold, created if missing.')
+        parser.add_argument('--seed-colors', type=int, default=10, help='Colors the database must hold, created if missing.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='Operations and their weights, as "operation=weight,...".')
+        parser.add_argument('--concurrency', default='1,4,16,32', help='Concurrency levels, run in this order.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of every concurrency level.')
+        parser.add_argument('--warmup', type=float, default=2, help='Seconds of load before the first level, not reported.')
+        parser.add_argument('--output', help='Write the summaries of the levels to this JSON file.')
+        parser.add_argument('--keep-data', action='store_true', help='Keep the users created by the run.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        mix = parse_mix(options['mix'])
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError(f'Invalid concurrency levels "{options["concurrency"]}".')
+
+        self.seed(options['seed_colors'], options['seed_cars'], options['seed_users'])
+        workload = Workload(
+            list(get_seeded_users().order_by('id').values_list('id', flat=True)[:100000]),
+            list(Car.objects.order_by('id').values_list('id', flat=True)[:100000]),
+        )
+        if not workload.user_ids or not workload.car_ids:
+            raise CommandError('The database holds no load test users or no cars, seed some.')
+
+        server = None
+        accounts = [LOAD_TEST_ACCOUNT.format(index) for index in range(max(levels))]
+
+        try:
+            tokens = self.get_tokens(accounts)
+
+            url = options['url']
+            if not url:
+                url = f'http://127.0.0.1:{options["port"]}'
+                server = self.start_server(options['port'], options['workers'], options['gunicorn_args'])
+
+            self.wait_for_server(url, server)
+            if options['warmup'] > 0:
+                run_level(url, tokens, workload, mix, min(levels), options['warmup'])
+
+            summaries = []
+            self.stdout.write(
+                f'{"clients":>7} {"requests":>9} {"req/s":>9} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} '
+                f'{"max ms":>8} {"errors":>7}  statuses'
+            )
+            for concurrency in levels:
+                summary = run_level(url, tokens, workload, mix, concurrency, options['duration'])
+                summaries.append(summary)
+                self.write_summary(summary)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+            # The accounts are deleted with their tokens, so that no credentials are left behind.
+            AuthUser.objects.filter(username__in=accounts).delete()
+
+            if not options['keep_data']:
+                User.objects.filter(lastname=LOAD_TEST_LASTNAME).delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'mix': mix, 'levels': summaries}, output, indent=2)
+
+    def seed(self, colors, cars, users):
+        """
+        Create the colors, cars with their colors and users missing from the database
+        """
+        with transaction.atomic():
+            missing = colors - Color.objects.count()
+            new_colors = Color.objects.bulk_create([
+                Color(name=f'{COLOR_NAMES[index % len(COLOR_NAMES)]}_{index}') for index in range(max(missing, 0))
+            ])
+            record_changes(Color, [color.id for color in new_colors])
+
+            color_names = dict(Color.objects.order_by('id').values_list('id', 'name')[:colors])
+            color_ids = list(color_names)
+
+            missing = cars - Car.objects.count()
+            car_colors = [random.sample(color_ids, min(3, len(color_ids))) for _ in range(max(missing, 0))]
+            new_cars = Car.objects.bulk_create([
+                Car(
+                    name=f'{CAR_NAMES[index % len(CAR_NAMES)]} {index}',
+                    color_list=[{'id': color_id, 'name': color_names[color_id]} for color_id in sorted(ids)],
+                )
+                for index, ids in enumerate(car_colors)
+            ])
+            CarHasColor.objects.bulk_create([
+                CarHasColor(car_id=car.id, color_id=color_id) for car, ids in zip(new_cars, car_colors) for color_id in ids
+            ])
+            record_changes(Car, [car.id for car in new_cars])
+
+            missing = users - get_seeded_users().count()
+            car_color_ids = dict(Car.objects.order_by('id').values_list('id', 'color_list')[:cars])
+            new_users = []
+            for index in range(max(missing, 0)):
+                user = User(
+                    firstname=random.choice(FIRSTNAMES),
+                    lastname=random.choice(LASTNAMES) + LOAD_TEST_MARKER,
+                    date_of_birth=datetime.date(1950, 1, 1) + datetime.timedelta(days=random.randint(0, 18000)),
+                )
+                # Half of the users drive a car in one of its colors.
+                if index % 2 and car_color_ids:
+                    user.car_id, car_colors = random.choice(list(car_color_ids.items()))
+                    user.has_driver_licence = True
+                    user.color_id = random.choice(car_colors)['id'] if car_colors else None
+                new_users.append(user)
+
+            new_users = User.objects.bulk_create(new_users, batch_size=5000)
+            record_changes(User, [user.id for user in new_users])
+
+        self.stdout.write(
+            f'Seeded {len(new_colors)} colors, {len(new_cars)} cars and {len(new_users)} users '
+            f'({Color.objects.count()} colors, {Car.objects.count()} cars, {User.objects.count()} users).'
+        )
+
+    def get_tokens(self, accounts):
+        """
+        Return the tokens of the load test accounts, created if missing
+        """
+        tokens = []
+        for username in accounts:
+            account, _ = AuthUser.objects.get_or_create(username=username)
+            tokens.append(Token.objects.get_or_create(user=account)[0].key)
+        return tokens
+
+    def start_server(self, port, workers, gunicorn_args):
+        """
+        Start gunicorn with the configuration of the Procfile, in the settings of the command
+        """
+        command = [
+            sys.executable, '-m', 'gunicorn',
+            '--config', os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'),
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            *shlex.split(gunicorn_args),
+            'collectify_api.wsgi',
+        ]
+        self.stdout.write(f'Starting {" ".join(command[2:])}')
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=dict(os.environ))
+
+    def wait_for_server(self, url, server, timeout=60):
+        """
+        Wait until the server answers HTTP requests
+        """
+        stop_at = time.monotonic() + timeout
+
+        while time.monotonic() < stop_at:
+            if server is not None and server.poll() is not None:
+                raise CommandError(f'The server exited with status {server.returncode}.')
+            try:
+                urllib.request.urlopen(url.rstrip('/') + '/catalogue/', timeout=5)
+                return
+            except urllib.error.HTTPError:
+                # Unauthenticated requests are refused once the server runs.
+                return
+            except OSError:
+                time.sleep(0.2)
+
+        raise CommandError(f'The server did not answer at {url} within {timeout} seconds.')
+
+    def write_summary(self, summary):
+        def milliseconds(value):
+            return '-' if value is None else f'{value:.1f}'
+
+        statuses = ' '.join(f'{status}:{count}' for status, count in summary['statuses'].items())
+        self.stdout.write(
+            f'{summary["concurrency"]:>7} {summary["requests"]:>9} {summary["throughput"]:>9.1f} '
+            f'{milliseconds(summary["p50"]):>8} {milliseconds(summary["p90"]):>8} {milliseconds(summary["p99"]):>8} '
+            f'{milliseconds(summary["max"]):>8} {summary["error_rate"]:>7.1%}  {statuses}'
+        )
+
+        if self.verbosity > 1:
+            for operation, latencies in summary['operations'].items():
+                self.stdout.write(
+                    f'{operation:>17} {latencies["requests"]:>9} {"":>9} {milliseconds(latencies["p50"]):>8} '
+                    f'{milliseconds(latencies["p90"]):>8} {milliseconds(latencies["p99"]):>8} '
+                    f'{milliseconds(latencies["max"]):>8} {latencies["error_rate"]:>7.1%}'
+                )
@@ -0,0 +1,34 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...apilogs import get_api_log_model
+
+
+class Command(BaseCommand):
+    help = 'Delete the API logs older than the retention window, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'COLLECTIFY_API_LOG_RETENTION_DAYS', 30))
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        model = get_api_log_model()
+        if model is None:
+            raise CommandError('API logs are not stored in the database (DRF_API_LOGGER_DATABASE).')
+
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        expired = model.objects.filter(added_on__lt=cutoff).order_by('added_on')
+        deleted = 0
+
+        # Short transactions, so that the inserts of the logger thread never wait for the cleanup.
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+
+            deleted += model.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} API logs older than {options["days"]} days deleted.'))
@@ -0,0 +1,31 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import Change
+
+
+class Command(BaseCommand):
+    help = 'Delete the changes of the change feed older than the retention window, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'COLLECTIFY_CHANGE_RETENTION_DAYS', 7))
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        # The oldest changes come first in the primary key, each batch stops once it has enough of them.
+        expired = Change.objects.filter(changed_at__lt=cutoff).order_by('id')
+        deleted = 0
+
+        # Short transactions, so that the writes recording their changes never wait for the cleanup.
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+
+            deleted += Change.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'{deleted} changes older than {options["days"]} days deleted.'))
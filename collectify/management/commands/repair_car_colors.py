@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from ...changes import record_changes
+from ...models import Car, CarHasColor
+from ...schema import DUPLICATE_CAR_COLORS
+from ...signals import get_color_lists, refresh_color_lists
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized color list of the cars that are out of sync with their colors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Cars checked per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Count the cars out of sync without repairing them.')
+        parser.add_argument(
+            '--delete-duplicates', action='store_true',
+            help='First delete the colors linked more than once to a car, keeping the first link.',
+        )
+
+    def handle(self, *args, **options):
+        if options['delete_duplicates']:
+            self.delete_duplicates(options['dry_run'])
+
+        last_id = 0
+        checked = 0
+        repaired = 0
+
+        while True:
+            with transaction.atomic():
+                cars = list(
+                    Car.objects
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .select_for_update()
+                    .only('id', 'color_list')[:options['batch_size']]
+                )
+                if not cars:
+                    break
+
+                color_lists = get_color_lists([car.id for car in cars])
+                out_of_sync = []
+
+                now = timezone.now()
+
+                for car in cars:
+                    if car.color_list != color_lists[car.id]:
+                        car.color_list = color_lists[car.id]
+                        car.updated_at = now
+                        out_of_sync.append(car)
+
+                if not options['dry_run']:
+                    Car.objects.bulk_update(out_of_sync, ['color_list', 'updated_at'])
+                    record_changes(Car, [car.id for car in out_of_sync])
+
+            last_id = cars[-1].id
+            checked += len(cars)
+            repaired += len(out_of_sync)
+
+        action = 'out of sync' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'{checked} cars checked, {repaired} {action}.'))
+
+    def delete_duplicates(self, dry_run):
+        """
+        Delete the duplicate car colors and rebuild the color lists of their cars.
+        The first link of each color is kept, so the colors of the users do not change.
+        """
+        duplicates = CarHasColor.objects.values('car_id', 'color_id').annotate(links=Count('id')).filter(links__gt=1)
+        car_ids = {duplicate['car_id'] for duplicate in duplicates}
+
+        if dry_run:
+            deleted = sum(duplicate['links'] - 1 for duplicate in duplicates)
+            self.stdout.write(f'{deleted} duplicate car colors in {len(car_ids)} cars.')
+            return
+
+        with transaction.atomic():
+            # Deleted without the signals of CarHasColor, which would remove the color from the users.
+            with connection.cursor() as cursor:
+                cursor.execute(DUPLICATE_CAR_COLORS)
+                deleted = cursor.rowcount
+            refresh_color_lists(car_ids)
+
+        self.stdout.write(f'{deleted} duplicate car colors deleted, the color lists of {len(car_ids)} cars rebuilt.')
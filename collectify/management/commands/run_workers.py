@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from ...jobs import claim_job, run_job
+from ...models import Job
+
+
+class Command(BaseCommand):
+    help = 'Run the background jobs with a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes.')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds between two polls of an idle worker.')
+        parser.add_argument('--once', action='store_true', help='Stop once no job is ready to run.')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            self.work(options)
+            return
+
+        # Forked processes must open their own database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=self.work, args=[options]) for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+
+        def stop(signum, frame):
+            for worker in workers:
+                worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        for worker in workers:
+            worker.join()
+
+    def work(self, options):
+        """
+        Run jobs until stopped, a job being run is finished before stopping
+        """
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+        while not stopping:
+            try:
+                job = claim_job()
+            except DatabaseError as error:
+                if options['once']:
+                    raise
+                # Lost connections and lock timeouts: reconnect at the next poll.
+                self.stderr.write(f'[{os.getpid()}] Claiming a job failed: {error}')
+                connections.close_all()
+                time.sleep(options['interval'])
+                continue
+
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+
+            start = time.monotonic()
+            run_job(job)
+            duration = time.monotonic() - start
+
+            message = f'[{os.getpid()}] {job.kind} job {job.id} {job.status} in {duration:.1f}s (attempt {job.attempts}).'
+            if job.status == Job.DONE:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stderr.write(f'{message}\n{job.error}')
@@ -0,0 +1,108 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Boots a worker the way gunicorn does: Django setup, WSGI application with
+# its middleware chain, then the URL configuration loaded by the first request.
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+application = get_wsgi_application()
+get_resolver().url_patterns
+boot = time.perf_counter() - start
+print(json.dumps({
+    'boot': boot,
+    'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def run_probe(settings_module, importtime=False):
+    """
+    Boot a worker in a new interpreter and return its measures and the -X importtime output
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE]
+
+    environment = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    result = subprocess.run(command, env=environment, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        raise CommandError(f'{settings_module} failed to boot:\n{result.stderr}')
+
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def get_package_import_times(importtime_output):
+    """
+    Sum the self import time of the modules of every top-level package, in milliseconds
+    """
+    times = defaultdict(float)
+
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        self_time, _, name = line[len('import time:'):].split('|')
+        if not self_time.strip().isdigit():
+            continue
+
+        times[name.strip().split('.')[0]] += int(self_time) / 1000
+
+    return sorted(times.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = 'Measure the boot time, memory and import time breakdown of a worker for settings modules.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('settings_modules', nargs='*',
+                            help='Settings modules to compare, the current one by default.')
+        parser.add_argument('--repeat', type=int, default=5, help='Boots measured per settings module, the median is reported.')
+        parser.add_argument('--top', type=int, default=15, help='Number of packages of the import time breakdown.')
+
+    def handle(self, *args, **options):
+        settings_modules = options['settings_modules'] or [os.environ['DJANGO_SETTINGS_MODULE']]
+        reports = []
+
+        for settings_module in settings_modules:
+            measures = [run_probe(settings_module)[0] for _ in range(max(options['repeat'], 1))]
+            _, importtime_output = run_probe(settings_module, importtime=True)
+
+            report = {
+                'settings': settings_module,
+                'boot': statistics.median(measure['boot'] for measure in measures),
+                'rss': statistics.median(measure['rss'] for measure in measures),
+                'modules': measures[-1]['modules'],
+            }
+            reports.append(report)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(settings_module))
+            self.stdout.write(
+                f'  boot {report["boot"] * 1000:.0f} ms, max RSS {report["rss"] / 1024:.1f} MB, '
+                f'{report["modules"]} modules'
+            )
+            self.stdout.write(f'  {"package":<30} {"import ms":>10}')
+            for package, milliseconds in get_package_import_times(importtime_output)[:options['top']]:
+                self.stdout.write(f'  {package:<30} {milliseconds:>10.1f}')
+
+        reference = reports[0]
+        for report in reports[1:]:
+            boot = (report['boot'] / reference['boot'] - 1) * 100
+            rss = (report['rss'] / reference['rss'] - 1) * 100
+            self.stdout.write(self.style.SUCCESS(
+                f'{report["settings"]} vs {reference["settings"]}: boot {boot:+.0f}%, max RSS {rss:+.0f}%'
+            ))
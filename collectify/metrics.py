@@ -0,0 +1,91 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+# Latency buckets in seconds, tuned for an API answering in tens of milliseconds.
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+
+# Number of SQL queries run by a single request.
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+
+REQUESTS = Counter(
+    'collectify_requests_total',
+    'Requests handled, by view, action, method and status code.',
+    ['view', 'action', 'method', 'status'],
+)
+
+REQUEST_LATENCY = Histogram(
+    'collectify_request_latency_seconds',
+    'Time spent handling a request, by view and action.',
+    ['view', 'action'],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUEST_QUERIES = Histogram(
+    'collectify_request_db_queries',
+    'SQL queries run while handling a request, by view and action.',
+    ['view', 'action'],
+    buckets=QUERY_BUCKETS,
+)
+
+QUERY_LATENCY = Histogram(
+    'collectify_db_query_latency_seconds',
+    'Time spent running a single SQL query, by view and action.',
+    ['view', 'action'],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_LOOKUPS = Counter(
+    'collectify_cache_lookups_total',
+    'Cache lookups, by cache name and result (hit or miss).',
+    ['cache', 'result'],
+)
+
+
+def record_cache_lookup(cache, hits=0, misses=0):
+    """
+    Count cache hits and misses, the hit ratio is computed from these counters
+    """
+    if hits:
+        CACHE_LOOKUPS.labels(cache=cache, result='hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache=cache, result='miss').inc(misses)
+
+
+def get_registry():
+    """
+    Return the registry to expose.
+    When gunicorn runs in multiprocess mode, every worker writes its samples
+    in PROMETHEUS_MULTIPROC_DIR and they are aggregated at scrape time.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """
+    Expose metrics in the Prometheus text format to the scrapers sending the COLLECTIFY_METRICS_TOKEN bearer token
+    """
+    token = getattr(settings, 'COLLECTIFY_METRICS_TOKEN', None)
+    authorization = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return HttpResponse(b'Invalid metrics token.', status=403, content_type='text/plain')
+
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,97 @@
+import logging
+import time
+import uuid
+
+from django.db import connection
+
+from . import logs, metrics
+
+
+access_logger = logging.getLogger('collectify.access')
+
+
+def get_view_labels(request):
+    """
+    Return the view and action labels of a request.
+    The view is the url name given by the router (e.g. "user-list", "car-detail")
+    and the action is the viewset action (e.g. "list", "create", "retrieve").
+    """
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', request.method.lower()
+
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+
+    return match.url_name or match.view_name or 'unnamed', action
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting and timing the queries of a request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.durations = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.durations.append(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency and database queries of every request, and write its access log.
+    The id of the request is taken from its X-Request-ID header, or generated, and returned in the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')[:200] or uuid.uuid4().hex
+        token = logs.request_id.set(request_id)
+        try:
+            return self.handle(request, request_id)
+        finally:
+            logs.request_id.reset(token)
+
+    def handle(self, request, request_id):
+        query_timer = QueryTimer()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(query_timer):
+            response = self.get_response(request)
+
+        latency = time.perf_counter() - start
+        view, action = get_view_labels(request)
+
+        metrics.REQUESTS.labels(view=view, action=action, method=request.method, status=response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(view=view, action=action).observe(latency)
+        metrics.REQUEST_QUERIES.labels(view=view, action=action).observe(query_timer.count)
+
+        query_latency = metrics.QUERY_LATENCY.labels(view=view, action=action)
+        for duration in query_timer.durations:
+            query_latency.observe(duration)
+
+        response['X-Request-ID'] = request_id
+        access_logger.info(
+            '%s %s %s', request.method, request.get_full_path(), response.status_code,
+            extra={
+                'request_id': request_id,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'view': view,
+                'action': action,
+                'latency_ms': round(latency * 1000, 2),
+                'queries': query_timer.count,
+            },
+        )
+
+        return response
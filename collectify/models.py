@@ -1,8 +1,14 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class Color(models.Model):
     name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'collectify_colors'
@@ -17,6 +23,10 @@ class Color(models.Model):
 class Car(models.Model):
     name = models.CharField(max_length=255)
     colors = models.ManyToManyField(Color, through='CarHasColor')
+    # Denormalized copy of the colors, as a list of {"id", "name"}, kept in sync by collectify.signals.
+    color_list = models.JSONField(default=list, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'collectify_cars'
@@ -34,6 +44,14 @@ class CarHasColor(models.Model):
 
     class Meta:
         db_table = 'collectify_car_has_color'
+        constraints = [
+            # Referenced by the car and color of users (see collectify.schema).
+            models.UniqueConstraint(fields=['car', 'color'], name='collectify_car_has_color_unique'),
+        ]
+        indexes = [
+            # Cars of a color, read by /colors/{id}/cars/ without visiting the table.
+            models.Index(fields=['color', 'car'], name='collectify_car_color_cars'),
+        ]
 
     def __str__(self):
         """
@@ -49,9 +67,15 @@ class User(models.Model):
     has_driver_licence = models.BooleanField(default=False)
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='users', blank=True, null=True, default=None)
     color = models.ForeignKey(Color, on_delete=models.CASCADE, related_name='users', blank=True, null=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'collectify_users'
+        indexes = [
+            # Users of a car in id order, read by /cars/{id}/users/.
+            models.Index(fields=['car', 'id'], name='collectify_users_car'),
+        ]
 
     def __str__(self):
         """
@@ -59,4 +83,119 @@ class User(models.Model):
         """
         return ' '.join([self.firstname, self.lastname])
 
+    def clean(self):
+        """
+        Check that the color of the user is one of the colors of their car, e.g. in the admin
+        """
+        if self.car_id and self.color_id and not CarHasColor.objects.filter(car_id=self.car_id, color_id=self.color_id).exists():
+            raise ValidationError({'color': 'The color must be one of the colors of the car.'})
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of an import_collectify source file, saved with every imported batch
+    """
+    source = models.CharField(max_length=1024, unique=True)
+    rows_read = models.PositiveBigIntegerField(default=0)
+    rows_imported = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'collectify_import_checkpoints'
+
+    def __str__(self):
+        """
+        return a string that represent the model in the admin app
+        """
+        return self.source
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a request sent with an Idempotency-Key header, replayed to its retries until it expires.
+    A key without status code belongs to a request still running.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True, default=None)
+    response = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True, default=None)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'collectify_idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='collectify_idempotency_keys_user_key'),
+        ]
+
+    def __str__(self):
+        """
+        return a string that represent the model in the admin app
+        """
+        return self.key
+
+
+class Change(models.Model):
+    """
+    Save or deletion of a user, car or color, read by the change feed.
+    On PostgreSQL, transaction_id is set by a trigger to the id of the writing transaction.
+    """
+    SAVE = 'save'
+    DELETE = 'delete'
+    ACTIONS = [(SAVE, 'save'), (DELETE, 'delete')]
+
+    model = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    transaction_id = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'collectify_changes'
+        indexes = [
+            models.Index(fields=['transaction_id', 'id'], name='collectify_changes_position'),
+        ]
+
+    def __str__(self):
+        """
+        return a string that represent the model in the admin app
+        """
+        return f'{self.action} {self.model} {self.object_id}'
+
+
+class Job(models.Model):
+    """
+    Background job run by the run_workers processes.
+    Pending jobs are run by decreasing priority, then in creation order, once run_after is passed.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'pending'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed')]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=8, choices=STATUSES, default=PENDING)
+    priority = models.SmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(blank=True, null=True, default=None)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'collectify_jobs'
+        indexes = [
+            models.Index(fields=['status', '-priority', 'id'], name='collectify_jobs_queue'),
+        ]
 
+    def __str__(self):
+        """
+        return a string that represent the model in the admin app
+        """
+        return f'{self.kind} {self.id}'
@@ -0,0 +1,59 @@
+"""
+Retrieve many objects by id in one request, e.g. GET /cars/?ids=1,2,3.
+
+The objects are read with one id IN (...) query of the list queryset, or
+from the representation cache, and returned in the order of the ids, with
+null for the ids that do not exist.
+"""
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+# Ids that a single request can retrieve.
+MAX_IDS = 1000
+
+# Range of the ids of BigAutoField.
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_ids(values):
+    """
+    Return the ids given as comma separated lists, refusing the ids that no object can have
+    """
+    try:
+        ids = [int(value) for value in ','.join(values).split(',') if value.strip()]
+    except ValueError:
+        ids = None
+
+    if ids is None or not all(1 <= object_id <= MAX_ID for object_id in ids):
+        raise ValidationError({'ids': ['Give a comma separated list of integers.']})
+
+    if not ids:
+        raise ValidationError({'ids': ['Give at least one id.']})
+    if len(ids) > MAX_IDS:
+        raise ValidationError({'ids': [f'Give at most {MAX_IDS} ids.']})
+
+    return ids
+
+
+class MultiGetMixin:
+    """
+    List the objects given by ?ids=, in the same order, with null for the missing ones
+    """
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        ids = parse_ids(request.query_params.getlist('ids'))
+        queryset = self.get_queryset().filter(id__in=set(ids))
+
+        if getattr(self, 'uses_representation_cache', lambda: False)():
+            versions = list(queryset.prefetch_related(None).values_list('id', 'updated_at'))
+            representations = self.get_representations(versions)
+        else:
+            representations = self.get_serializer(queryset, many=True).data
+
+        objects = {item['id']: item for item in representations}
+        return Response([objects.get(object_id) for object_id in ids])
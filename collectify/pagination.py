@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from .metrics import record_cache_lookup
+
+
+# Seconds during which a cached count is used before being counted again.
+DEFAULT_COUNT_CACHE_TTL = 60
+
+
+def estimate_count(queryset):
+    """
+    Return the number of rows of a queryset estimated by the PostgreSQL planner,
+    or None when no estimate is available.
+    An unfiltered queryset uses the table statistics, a filtered one the plan of the query.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # Tables never analyzed have reltuples = -1.
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting exactly small result sets and using the planner estimate for large ones
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+
+        estimate = estimate_count(self.object_list)
+
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+
+        return estimate
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator counting exactly small result sets, and caching the exact count of large ones.
+    A stale count is still returned while a background thread counts again, and
+    the estimate is returned until the first count is done.
+    """
+    exact_count_threshold = 10000
+    refresh_in_background = True
+
+    # Keys of the counts running in the background threads of the process.
+    refreshing = set()
+    refreshing_lock = threading.Lock()
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'collectify-count:' + hashlib.sha1(f'{sql} {params!r}'.encode()).hexdigest()
+        cached = cache.get(key)
+        record_cache_lookup('counts', hits=int(cached is not None), misses=int(cached is None))
+
+        if cached is None:
+            estimate = estimate_count(self.object_list)
+            if estimate is None or estimate < self.exact_count_threshold:
+                return self.count_exactly(key)
+
+            self.refresh(key)
+            return estimate
+
+        count, counted_at = cached
+        if time.time() - counted_at > getattr(settings, 'COLLECTIFY_COUNT_CACHE_TTL', DEFAULT_COUNT_CACHE_TTL):
+            self.refresh(key)
+
+        return count
+
+    def count_exactly(self, key):
+        count = self.object_list.count()
+        cache.set(key, (count, time.time()), None)
+        return count
+
+    def refresh(self, key):
+        """
+        Count again in a background thread, unless a thread of the process already does
+        """
+        if not self.refresh_in_background:
+            self.count_exactly(key)
+            return
+
+        with self.refreshing_lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        threading.Thread(target=self.refresh_thread, args=[key], daemon=True).start()
+
+    def refresh_thread(self, key):
+        try:
+            self.count_exactly(key)
+        finally:
+            with self.refreshing_lock:
+                self.refreshing.discard(key)
+            # The thread opened its own connection.
+            connections.close_all()
+
+
+class CountedPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination whose count strategy is set by the count_strategy of the viewset:
+    "exact", "estimated" (planner estimate above a threshold) or "cached" (exact count cached).
+    Lists requested without page nor page_size are not paginated.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    count_paginators = {
+        'exact': Paginator,
+        'estimated': EstimatedCountPaginator,
+        'cached': CachedCountPaginator,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+
+        self.django_paginator_class = self.count_paginators[getattr(view, 'count_strategy', 'estimated')]
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RelationPagination(CursorPagination):
+    """
+    Keyset pagination of the nested routes: pages follow the id index, without counting nor offsetting rows
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,111 @@
+"""
+Cache of the serialized representation of every object.
+
+A representation is stored under a key made of the serializer, the object id
+and its updated_at, so a write changing updated_at makes the next read miss.
+Saves, bulk updates and changes of the car colors (links, renamed or deleted
+colors) all update updated_at, which needs no invalidation message between
+the workers. Old versions are evicted by the cache, set by
+COLLECTIFY_REPRESENTATION_CACHE, with LRU eviction and a bounded size:
+
+    CACHES = {
+        'representations': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'collectify-representations',
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+from rest_framework.response import Response
+
+from .metrics import record_cache_lookup
+
+
+# Objects whose representations are looked up and read at once.
+REPRESENTATION_BATCH_SIZE = 1000
+
+def get_representation_cache():
+    return caches[getattr(settings, 'COLLECTIFY_REPRESENTATION_CACHE', 'representations')]
+
+
+def get_representation_key(serializer_class, object_id, updated_at):
+    return f'{serializer_class.__name__}:{object_id}:{updated_at.timestamp()}'
+
+
+class CachedRepresentationMixin:
+    """
+    Retrieve and list objects from their cached representations.
+
+    Only the id and updated_at of the objects are read to build the keys, the
+    objects missing from the cache are read and serialized by batches of
+    REPRESENTATION_BATCH_SIZE, which bounds the queries of unpaginated lists.
+    """
+
+    def get_representations(self, versions):
+        """
+        Return the representations of objects given as (id, updated_at), in the same order
+        """
+        representations = []
+        for start in range(0, len(versions), REPRESENTATION_BATCH_SIZE):
+            representations.extend(self.get_batch_representations(versions[start:start + REPRESENTATION_BATCH_SIZE]))
+        return representations
+
+    def get_batch_representations(self, versions):
+        cache = get_representation_cache()
+        serializer_class = self.get_serializer_class()
+        keys = [get_representation_key(serializer_class, object_id, updated_at) for object_id, updated_at in versions]
+        cached = cache.get_many(keys)
+        representations = {object_id: cached[key] for (object_id, _), key in zip(versions, keys) if key in cached}
+
+        missing_ids = [object_id for object_id, _ in versions if object_id not in representations]
+        record_cache_lookup('representations', hits=len(representations), misses=len(missing_ids))
+        if missing_ids:
+            objects = list(self.get_queryset().filter(id__in=missing_ids))
+            new_representations = {}
+
+            for instance, data in zip(objects, self.get_serializer(objects, many=True).data):
+                representations[instance.id] = data
+                new_representations[get_representation_key(serializer_class, instance.id, instance.updated_at)] = data
+
+            cache.set_many(new_representations)
+
+        # Objects deleted since their version was read are left out.
+        return [representations[object_id] for object_id, _ in versions if object_id in representations]
+
+    def uses_representation_cache(self):
+        return True
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.uses_representation_cache():
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        versions = queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]}).prefetch_related(None)
+        versions = list(versions.values_list('id', 'updated_at')[:1])
+
+        representations = self.get_representations(versions)
+        if not representations:
+            raise Http404
+
+        return Response(representations[0])
+
+    def list(self, request, *args, **kwargs):
+        if not self.uses_representation_cache():
+            return super().list(request, *args, **kwargs)
+
+        versions = self.filter_queryset(self.get_queryset()).prefetch_related(None).values_list('id', 'updated_at')
+        if not versions.ordered:
+            # Reading the covering updated_at index would otherwise return the objects by update time.
+            versions = versions.order_by('id')
+
+        page = self.paginate_queryset(versions)
+        if page is not None:
+            return self.get_paginated_response(self.get_representations(page))
+
+        return Response(self.get_representations(list(versions)))
@@ -0,0 +1,93 @@
+"""
+Schema objects that the models cannot declare for every database backend.
+They are created on PostgreSQL after each migrate. A migrate adding a
+constraint that existing rows break stops before it, until they are repaired.
+"""
+
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+POSTGRESQL_STATEMENTS = [
+    # Case insensitive prefix search on user names ("^lastname" search fields of the admin).
+    'CREATE INDEX IF NOT EXISTS collectify_users_lastname_prefix '
+    'ON collectify_users (UPPER(lastname::text) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS collectify_users_firstname_prefix '
+    'ON collectify_users (UPPER(firstname::text) text_pattern_ops)',
+    # Case insensitive search of parts of user and car names (?search=, see collectify.search).
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS collectify_users_lastname_trgm '
+    'ON collectify_users USING gin (UPPER(lastname::text) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS collectify_users_firstname_trgm '
+    'ON collectify_users USING gin (UPPER(firstname::text) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS collectify_cars_name_trgm '
+    'ON collectify_cars USING gin (UPPER(name::text) gin_trgm_ops)',
+    # Id of the transaction writing a change, read by the change feed (see collectify.changes).
+    'CREATE OR REPLACE FUNCTION collectify_changes_transaction_id() RETURNS trigger AS $$ '
+    'BEGIN NEW.transaction_id := txid_current(); RETURN NEW; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS collectify_changes_transaction_id ON collectify_changes',
+    'CREATE TRIGGER collectify_changes_transaction_id BEFORE INSERT ON collectify_changes '
+    'FOR EACH ROW EXECUTE PROCEDURE collectify_changes_transaction_id()',
+    # The color of a user is one of the colors of their car. The colors of existing users are checked once,
+    # then deleting a car color removes it from its users (rejected before PostgreSQL 15, which cannot
+    # set only color_id to NULL): the ORM removes it first, see collectify.signals.
+    "DO $$ BEGIN "
+    "IF NOT EXISTS (SELECT FROM pg_constraint WHERE conname = 'collectify_users_car_color') THEN "
+    "UPDATE collectify_users SET color_id = NULL "
+    "WHERE car_id IS NOT NULL AND color_id IS NOT NULL AND NOT EXISTS ("
+    "SELECT FROM collectify_car_has_color link "
+    "WHERE link.car_id = collectify_users.car_id AND link.color_id = collectify_users.color_id); "
+    "EXECUTE 'ALTER TABLE collectify_users ADD CONSTRAINT collectify_users_car_color "
+    "FOREIGN KEY (car_id, color_id) REFERENCES collectify_car_has_color (car_id, color_id) ON DELETE ' "
+    "|| CASE WHEN current_setting('server_version_num')::int >= 150000 THEN 'SET NULL (color_id)' ELSE 'NO ACTION' END "
+    "|| ' DEFERRABLE INITIALLY DEFERRED'; "
+    "END IF; END $$",
+]
+
+
+def create_postgresql_objects(using='default', **kwargs):
+    """
+    post_migrate receiver creating the PostgreSQL specific schema objects
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        for statement in POSTGRESQL_STATEMENTS:
+            cursor.execute(statement)
+
+
+# Car colors linked more than once, the first link of each pair is kept.
+DUPLICATE_CAR_COLORS = (
+    'DELETE FROM collectify_car_has_color WHERE id NOT IN ('
+    'SELECT MIN(id) FROM collectify_car_has_color GROUP BY car_id, color_id)'
+)
+
+UNIQUE_CAR_COLOR_CONSTRAINT = 'collectify_car_has_color_unique'
+
+
+def check_duplicate_car_colors(using='default', **kwargs):
+    """
+    pre_migrate receiver stopping the migrate while car colors are linked more than once,
+    which the unique car and color constraint refuses. The table is only read until the constraint exists.
+    """
+    connection = connections[using]
+    if 'collectify_car_has_color' not in connection.introspection.table_names():
+        return
+
+    with connection.cursor() as cursor:
+        if UNIQUE_CAR_COLOR_CONSTRAINT in connection.introspection.get_constraints(cursor, 'collectify_car_has_color'):
+            return
+
+        cursor.execute(
+            'SELECT COUNT(*) FROM (SELECT car_id FROM collectify_car_has_color '
+            'GROUP BY car_id, color_id HAVING COUNT(*) > 1) duplicates'
+        )
+        duplicates = cursor.fetchone()[0]
+
+    if duplicates:
+        raise CommandError(
+            f'{duplicates} car colors are linked more than once to their car, which the unique constraint refuses. '
+            'Run "manage.py repair_car_colors --delete-duplicates" before migrating.'
+        )
@@ -0,0 +1,83 @@
+"""
+Search users and cars by parts of their names with ?search=.
+
+Every word of the search must be contained in one of the search_fields of the
+view, case insensitively, and the results are ranked by similarity with the
+search. On PostgreSQL the UPPER(field) LIKE '%word%' conditions read the
+pg_trgm GIN indexes of the fields (see collectify.schema) and the rank is the
+word similarity of the search with the fields. Other backends scan the table
+and rank exact then prefix matches first.
+
+A search matching many rows (e.g. a common last name) only returns its
+MAX_SEARCH_RESULTS most similar matches: refining the search returns the
+others.
+"""
+
+import functools
+import operator
+
+from django.contrib.postgres.search import TrigramSimilarity, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Concat
+from rest_framework.filters import BaseFilterBackend
+
+
+# Words shorter than a trigram cannot be found in the trigram indexes, they match the start of the fields.
+MIN_TRIGRAM_LENGTH = 3
+
+# Words of a search beyond this number are ignored.
+MAX_SEARCH_WORDS = 5
+
+# Matches of a search that are ranked and returned.
+MAX_SEARCH_RESULTS = 1000
+
+
+def any_field(fields, lookup, value):
+    return functools.reduce(operator.or_, (Q(**{f'{field}__{lookup}': value}) for field in fields))
+
+
+class TrigramSearchFilter(BaseFilterBackend):
+    """
+    Filter on the search_fields of the view containing every word of ?search=, ranked by similarity
+    """
+    search_param = 'search'
+
+    def get_search_words(self, request):
+        return request.query_params.get(self.search_param, '').split()[:MAX_SEARCH_WORDS]
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'search_fields', None)
+        words = self.get_search_words(request)
+        if not fields or not words:
+            return queryset
+
+        matches = queryset
+        for word in words:
+            lookup = 'icontains' if len(word) >= MIN_TRIGRAM_LENGTH else 'istartswith'
+            matches = matches.filter(any_field(fields, lookup, word))
+
+        # The matches are ranked before being capped, so that the cap keeps the most similar ones.
+        rank = self.get_rank(queryset, fields, words)
+        matches = matches.alias(search_rank=rank).order_by('-search_rank', 'id').values('id')[:MAX_SEARCH_RESULTS]
+        return queryset.filter(id__in=matches).alias(search_rank=rank).order_by('-search_rank', 'id')
+
+    def get_rank(self, queryset, fields, words):
+        """
+        Return the expression ranking the results of a search, the most similar first
+        """
+        search = ' '.join(words)
+
+        if connections[queryset.db].vendor == 'postgresql':
+            # "firstname lastname" is compared with "henry dup" at once.
+            names = [value for field in fields for value in (field, Value(' '))][:-1]
+            names = Concat(*names) if len(fields) > 1 else fields[0]
+            # "Tesla" comes before "Tesla Model 3", which contains the search as well.
+            return TrigramWordSimilarity(search, names) + TrigramSimilarity(names, search)
+
+        return Case(
+            When(any_field(fields, 'iexact', search), then=Value(2)),
+            When(any_field(fields, 'istartswith', words[0]), then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
@@ -1,6 +1,73 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 from rest_framework import serializers
 
-from .models import CarHasColor, Color, Car, User
+from .changes import record_queryset_changes
+from .models import CarHasColor, Color, Car, Job, User
+from .signals import color_list_refresh
+
+
+def get_car_color_ids(car_ids):
+    """
+    Return a dictionary mapping the ids of existing cars to the set of their color ids
+    """
+    car_color_ids = {}
+    rows = Car.objects.filter(id__in=car_ids).values_list('id', 'car_has_color__color_id')
+
+    for car_id, color_id in rows:
+        color_ids = car_color_ids.setdefault(car_id, set())
+        if color_id is not None:
+            color_ids.add(color_id)
+
+    return car_color_ids
+
+
+def clean_car_and_color(data, car_color_ids):
+    """
+    Apply the car and color rules to user data:
+    a user without a driver licence has no car and no color,
+    a car that does not exist is removed with its color,
+    a color that is not one of the car colors is removed.
+    car_color_ids maps existing car ids to the set of their color ids.
+    """
+    has_driver_licence = data.get('has_driver_licence')
+    car_id = data.get('car_id')
+    color_id = data.get('color_id')
+
+    if not has_driver_licence:
+        data['car_id'] = None
+        data['color_id'] = None
+
+    elif car_id and car_id not in car_color_ids:
+        data['car_id'] = None
+        data['color_id'] = None
+
+    elif car_id and color_id and color_id not in car_color_ids[car_id]:
+        data['color_id'] = None
+
+
+def set_changed_fields(instance, values):
+    """
+    Set the values that differ from the fields of an instance, and return the names of these fields
+    """
+    changed_fields = []
+
+    for name, value in values.items():
+        if getattr(instance, name) != value:
+            setattr(instance, name, value)
+            changed_fields.append(name)
+
+    return changed_fields
+
+
+def save_changed_fields(instance, changed_fields):
+    """
+    Write the changed fields of an instance with its updated_at, or nothing when no field changed
+    """
+    if changed_fields:
+        instance.save(update_fields=[*changed_fields, 'updated_at'])
+
 
 class CarHasColorSerializer(serializers.ModelSerializer):
 
@@ -13,7 +80,12 @@ class ColorSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Color
-        fields = '__all__'
+        exclude = ['created_at', 'updated_at']
+
+    def update(self, color, validated_data):
+        # Renaming a color rewrites the color list of its cars, an unchanged name writes nothing.
+        save_changed_fields(color, set_changed_fields(color, validated_data))
+        return color
 
 
 class CarSerializer(serializers.ModelSerializer):
@@ -25,29 +97,79 @@ class CarSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         color_data = validated_data.pop('colors')
-        car = Car.objects.create(**validated_data)
-        car.save()
 
-        for data in color_data:
-            color = Color.objects.get(name=data.get('name'))
-            CarHasColor.objects.create(car=car, color=color)
+        with transaction.atomic(), color_list_refresh():
+            car = Car.objects.create(**validated_data)
+            car.save()
+
+            for name in dict.fromkeys(data.get('name') for data in color_data):
+                color = Color.objects.get(name=name)
+                CarHasColor.objects.create(car=car, color=color)
 
         return car
 
     def update(self, car, validated_data):
-        color_data = validated_data.pop('colors')
-        car.name = validated_data.get('name', car.name)
-        car.save()
+        color_data = validated_data.pop('colors', None)
+
+        with transaction.atomic(), color_list_refresh():
+            save_changed_fields(car, set_changed_fields(car, {'name': validated_data.get('name', car.name)}))
 
-        CarHasColor.objects.filter(car=car).delete()
+            # A partial update without colors keeps the links.
+            if color_data is None:
+                return car
 
-        for data in color_data:
-            color = Color.objects.get(name=data.get('name'))
-            CarHasColor.objects.create(car=car, color=color)
+            # Only the links of the removed and added colors are written.
+            color_ids = [Color.objects.get(name=data.get('name')).id for data in color_data]
+            current_color_ids = set(CarHasColor.objects.filter(car=car).values_list('color_id', flat=True))
+
+            if current_color_ids - set(color_ids):
+                CarHasColor.objects.filter(car=car).exclude(color_id__in=color_ids).delete()
+
+            for color_id in dict.fromkeys(color_ids):
+                if color_id not in current_color_ids:
+                    CarHasColor.objects.create(car=car, color_id=color_id)
 
         return car
 
 
+class DenormalizedCarSerializer(serializers.ModelSerializer):
+    """
+    Read cars with their colors from the denormalized color list, without joins
+    """
+    colors = serializers.JSONField(source='color_list', read_only=True)
+
+    class Meta:
+        model = Car
+        fields = ['id', 'name', 'colors']
+
+
+# Related objects that can be expanded in users, with the lookups prefetching them.
+USER_EXPANSIONS = {
+    'car': ['car', 'car__colors'],
+    'color': ['color'],
+}
+
+
+def get_user_expand(query_params):
+    """
+    Return the relations to expand in users, given as ?expand=car,color
+    """
+    expand = {name.strip() for name in query_params.get('expand', '').split(',') if name.strip()}
+    unknown = sorted(expand - set(USER_EXPANSIONS))
+
+    if unknown:
+        raise serializers.ValidationError({'expand': [f'Unknown relation "{name}".' for name in unknown]})
+
+    return expand
+
+
+def expand_users(queryset, expand):
+    """
+    Prefetch the expanded relations of users, with one query per relation
+    """
+    return queryset.prefetch_related(*[lookup for name in sorted(expand) for lookup in USER_EXPANSIONS[name]])
+
+
 class UserSerializer(serializers.ModelSerializer):
     # Add foreign key fields using id.
     car_id = serializers.IntegerField(required=False, allow_null=True)
@@ -55,28 +177,39 @@ class UserSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = '__all__'
+        exclude = ['created_at', 'updated_at']
+
+    def set_car_and_color(self, validated_data, user=None):
+        """
+        Apply the car and color rules to the validated data, completed by the current user for partial updates.
+        The database keeps the car and color of users consistent, an unchanged pair is not read again.
+        """
+        if user is not None and self.partial:
+            for name in ('has_driver_licence', 'car_id', 'color_id'):
+                validated_data.setdefault(name, getattr(user, name))
 
-    def set_car_and_color(self, validated_data):
-        has_driver_licence = validated_data.get('has_driver_licence')
         car_id = validated_data.get('car_id')
         color_id = validated_data.get('color_id')
+        car_color_ids = {}
 
-        if not has_driver_licence:
-            validated_data['car_id'] = None
-            validated_data['color_id']= None
+        if validated_data.get('has_driver_licence') and car_id:
+            if user is not None and (car_id, color_id) == (user.car_id, user.color_id):
+                car_color_ids = {car_id: {color_id}}
+            else:
+                car_color_ids = get_car_color_ids([car_id])
 
-        elif car_id and color_id:
-            try:
-                car = Car.objects.get(id=car_id)
-                color_ids = [color.id for color in car.colors.all()]
+        clean_car_and_color(validated_data, car_color_ids)
 
-                if color_id not in color_ids:
-                    validated_data['color_id']= None
+    def to_representation(self, user):
+        data = super().to_representation(user)
+        expand = self.context.get('expand', ())
 
-            except Car.DoesNotExist:
-                validated_data['car_id'] = None
-                validated_data['color_id']= None
+        if 'car' in expand:
+            data['car'] = CarSerializer(user.car).data if user.car_id else None
+        if 'color' in expand:
+            data['color'] = ColorSerializer(user.color).data if user.color_id else None
+
+        return data
 
     def create(self, validated_data):
         self.set_car_and_color(validated_data)
@@ -87,14 +220,148 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
     def update(self, user, validated_data):
-        self.set_car_and_color(validated_data)
+        self.set_car_and_color(validated_data, user)
 
-        user.firstname = validated_data.get('firstname', user.firstname)
-        user.lastname = validated_data.get('lastname', user.lastname)
-        user.date_of_birth = validated_data.get('date_of_birth', user.date_of_birth)
-        user.has_driver_licence = validated_data.get('has_driver_licence', user.has_driver_licence)
-        user.car_id = validated_data.get('car_id', user.car_id)
-        user.color_id = validated_data.get('color_id', user.color_id)
-        user.save()
+        fields = ['firstname', 'lastname', 'date_of_birth', 'has_driver_licence', 'car_id', 'color_id']
+        values = {name: validated_data[name] for name in fields if name in validated_data}
+        save_changed_fields(user, set_changed_fields(user, values))
 
         return user
+
+
+class UserFilterSerializer(serializers.Serializer):
+    has_driver_licence = serializers.BooleanField(required=False)
+    car_id = serializers.IntegerField(required=False, allow_null=True)
+    color_id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class UserBulkSerializer(serializers.Serializer):
+    """
+    Select users by ids and/or filters, and validate the data of a bulk update
+    """
+    max_ids = 10000
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=max_ids)
+    filter = UserFilterSerializer(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and not attrs.get('filter'):
+            raise serializers.ValidationError('Select users with "ids" or "filter".')
+        return attrs
+
+    def validate_data(self, data):
+        serializer = UserSerializer(data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_queryset(self):
+        queryset = User.objects.all()
+
+        if self.validated_data.get('ids'):
+            queryset = queryset.filter(id__in=self.validated_data['ids'])
+        if self.validated_data.get('filter'):
+            queryset = queryset.filter(**self.validated_data['filter'])
+
+        return queryset
+
+    def update_users(self):
+        """
+        Update the selected users and return the number of updated rows
+        """
+        return bulk_update_users(self.get_queryset(), self.validated_data.get('data') or {})
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = '__all__'
+
+
+class ChangeQuerySerializer(serializers.Serializer):
+    """
+    Validate the cursor and the page size of the change feed.
+    A cursor is "<transaction id>.<change id>", the position of the last change read.
+    """
+    max_limit = 1000
+
+    since = serializers.RegexField(r'^\d+\.\d+$', required=False, default='0.0')
+    limit = serializers.IntegerField(min_value=1, max_value=max_limit, default=500)
+
+    def validate_since(self, since):
+        transaction_id, change_id = since.split('.')
+        return int(transaction_id), int(change_id)
+
+
+def bulk_update_users(queryset, data):
+    """
+    Update users with set-based statements applying the car and color rules:
+    users without a driver licence are only updated with their names and date of birth,
+    a car that does not exist is removed with its color,
+    a color is only kept if it is one of the car colors, or if the user has no car.
+    """
+    fields = {name: data[name] for name in ('firstname', 'lastname', 'date_of_birth') if name in data}
+    has_driver_licence = data.get('has_driver_licence')
+
+    if has_driver_licence is False:
+        with transaction.atomic():
+            record_queryset_changes(queryset)
+            return queryset.update(**fields, has_driver_licence=False, car_id=None, color_id=None, updated_at=timezone.now())
+
+    licence_fields = dict(fields)
+
+    if 'car_id' in data:
+        car_id = data['car_id']
+        car_color_ids = get_car_color_ids([car_id]) if car_id else {}
+
+        if car_id is None:
+            # Users without a car keep their color, or get the given one.
+            licence_fields['car_id'] = None
+            if 'color_id' in data:
+                licence_fields['color_id'] = data['color_id']
+
+        elif car_id not in car_color_ids:
+            licence_fields.update(car_id=None, color_id=None)
+
+        elif 'color_id' in data:
+            color_id = data['color_id']
+            licence_fields.update(car_id=car_id, color_id=color_id if color_id in car_color_ids[car_id] else None)
+
+        else:
+            # Keep the current color of each user when the new car has it.
+            licence_fields.update(car_id=car_id, color_id=Case(
+                When(color_id__in=car_color_ids[car_id], then=F('color_id')),
+                default=None,
+            ))
+
+    elif 'color_id' in data:
+        color_id = data['color_id']
+        # Give the color to the users without a car and to the users whose car has it.
+        licence_fields['color_id'] = color_id and Case(
+            When(car_id__isnull=True, then=Value(color_id)),
+            When(car_id__in=CarHasColor.objects.filter(color_id=color_id).values('car_id'), then=Value(color_id)),
+            default=None,
+        )
+
+    if not licence_fields and not has_driver_licence:
+        return 0
+
+    updated_at = timezone.now()
+
+    with transaction.atomic():
+        record_queryset_changes(queryset)
+
+        if has_driver_licence:
+            return queryset.update(**licence_fields, has_driver_licence=True, updated_at=updated_at)
+
+        if licence_fields == fields:
+            return queryset.update(**fields, updated_at=updated_at)
+
+        updated = 0
+        if licence_fields:
+            updated += queryset.filter(has_driver_licence=True).update(**licence_fields, updated_at=updated_at)
+        if fields:
+            updated += queryset.filter(has_driver_licence=False).update(**fields, updated_at=updated_at)
+
+        return updated
@@ -0,0 +1,155 @@
+"""
+Keep the denormalized color list of cars in sync with their colors.
+
+Writes to CarHasColor and Color refresh the color list of the cars they touch
+in the same transaction. Within color_list_refresh(), refreshes are collected
+and run at once for all the cars when the block exits. Deleted CarHasColor
+links also remove their color from the users of their car.
+"""
+
+import contextlib
+import threading
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .changes import record_changes
+from .models import CarHasColor, Color, Car, User
+
+
+_pending = threading.local()
+
+
+def get_color_lists(car_ids):
+    """
+    Return the color lists of cars, as lists of {"id", "name"} ordered like the car colors
+    """
+    color_lists = {car_id: [] for car_id in car_ids}
+    links = (
+        CarHasColor.objects
+        .filter(car_id__in=car_ids)
+        .order_by('id')
+        .values_list('car_id', 'color_id', 'color__name')
+    )
+
+    for car_id, color_id, name in links:
+        color_lists[car_id].append({'id': color_id, 'name': name})
+
+    return color_lists
+
+
+def refresh_color_lists(car_ids, batch_size=1000):
+    """
+    Rewrite the color list of cars from their colors.
+    The cars are locked before their links are read: a concurrent refresh of the same cars waits,
+    then reads the links committed by this one, so that neither overwrites the other with a stale list.
+    """
+    car_ids = sorted(car_ids)
+    now = timezone.now()
+
+    for start in range(0, len(car_ids), batch_size):
+        batch = car_ids[start:start + batch_size]
+
+        with transaction.atomic(savepoint=False):
+            list(Car.objects.select_for_update().filter(id__in=batch).order_by('id').values_list('id', flat=True))
+            color_lists = get_color_lists(batch)
+            cars = [Car(id=car_id, color_list=color_list, updated_at=now) for car_id, color_list in color_lists.items()]
+            Car.objects.bulk_update(cars, ['color_list', 'updated_at'])
+            record_changes(Car, color_lists)
+
+
+def schedule_refresh(car_ids):
+    """
+    Refresh the color list of cars now, or when the current color_list_refresh() block exits
+    """
+    pending = getattr(_pending, 'car_ids', None)
+
+    if pending is None:
+        refresh_color_lists(car_ids)
+    else:
+        pending.update(car_ids)
+
+
+@contextlib.contextmanager
+def color_list_refresh():
+    """
+    Collect the cars whose colors change in the block and refresh them once
+    """
+    if getattr(_pending, 'car_ids', None) is not None:
+        yield
+        return
+
+    _pending.car_ids = set()
+    try:
+        yield
+        car_ids = _pending.car_ids
+    finally:
+        _pending.car_ids = None
+
+    refresh_color_lists(car_ids)
+
+
+def clear_link_colors(links):
+    """
+    Remove the colors of links from the users of their cars, before deleting the links.
+    The database sets them to NULL too, this also updates updated_at and records the changes.
+    """
+    users = User.objects.filter(Exists(links.filter(car_id=OuterRef('car_id'), color_id=OuterRef('color_id'))))
+    user_ids = list(users.values_list('id', flat=True))
+
+    if user_ids:
+        User.objects.filter(id__in=user_ids).update(color_id=None, updated_at=timezone.now())
+        record_changes(User, user_ids)
+
+
+def is_deleted_with(origin, model):
+    """
+    Return True if a deletion comes from the deletion of instances of model
+    """
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(post_save, sender=CarHasColor)
+def refresh_car_color_list(sender, instance, **kwargs):
+    schedule_refresh([instance.car_id])
+
+
+@receiver(pre_delete, sender=CarHasColor)
+def clear_deleted_link_colors(sender, instance, origin=None, **kwargs):
+    # The users of deleted cars and colors are deleted with them.
+    if is_deleted_with(origin, Car) or is_deleted_with(origin, Color):
+        return
+
+    if origin is instance:
+        clear_link_colors(CarHasColor.objects.filter(id=instance.id))
+
+    elif is_deleted_with(origin, CarHasColor) and not getattr(origin, 'link_colors_cleared', False):
+        # The links of a queryset are cleared at once, before any of them is deleted.
+        clear_link_colors(origin)
+        origin.link_colors_cleared = True
+
+
+@receiver(post_delete, sender=CarHasColor)
+def refresh_deleted_car_color_list(sender, instance, origin=None, **kwargs):
+    # Deleted cars need no refresh, and deleted colors refresh their cars at once.
+    if not is_deleted_with(origin, Car) and not is_deleted_with(origin, Color):
+        schedule_refresh([instance.car_id])
+
+
+@receiver(post_save, sender=Color)
+def refresh_color_cars(sender, instance, created, **kwargs):
+    if not created:
+        schedule_refresh(CarHasColor.objects.filter(color=instance).values_list('car_id', flat=True))
+
+
+@receiver(pre_delete, sender=Color)
+def collect_color_cars(sender, instance, **kwargs):
+    instance.deleted_car_ids = list(CarHasColor.objects.filter(color=instance).values_list('car_id', flat=True))
+
+
+@receiver(post_delete, sender=Color)
+def refresh_deleted_color_cars(sender, instance, **kwargs):
+    schedule_refresh(getattr(instance, 'deleted_car_ids', []))
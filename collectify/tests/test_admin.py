@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User as AuthUser
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import CarHasColor, Color, Car, User
+from ..pagination import EstimatedCountPaginator
+
+
+class AdminTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        '''
+        Create the objects shared by every test.
+        '''
+        cls.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        # Log in the admin.
+        self.client.force_login(self.authUser)
+
+        # Create links.
+        self.user_changelist = reverse('admin:collectify_user_changelist')
+        self.car_has_color_changelist = reverse('admin:collectify_carhascolor_changelist')
+
+    def create_users(self, count):
+        for index in range(count):
+            color = Color.objects.create(name=f'color_{index}')
+            car = Car.objects.create(name=f'car_{index}')
+            CarHasColor.objects.create(car=car, color=color)
+            User.objects.create(firstname=f'Henry_{index}', lastname=f'Dupont_{index}', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=car, color=color)
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Changelists fetch related cars and colors with the rows.
+        """
+        self.create_users(2)
+        user_queries = self.count_queries(self.user_changelist)
+        link_queries = self.count_queries(self.car_has_color_changelist)
+
+        self.create_users(3)
+
+        # The number of queries should not depend on the number of rows.
+        self.assertEqual(self.count_queries(self.user_changelist), user_queries)
+        self.assertEqual(self.count_queries(self.car_has_color_changelist), link_queries)
+
+    def test_search_users(self):
+        """
+        Search users by name prefix and by id.
+        """
+        self.create_users(3)
+        user = User.objects.get(lastname='Dupont_1')
+
+        response = self.client.get(self.user_changelist, {'q': 'dupont_1'})
+        # The user should be found by the prefix of its last name.
+        self.assertEqual(list(response.context['cl'].result_list), [user])
+
+        response = self.client.get(self.user_changelist, {'q': str(user.id)})
+        # The user should be found by id.
+        self.assertEqual(list(response.context['cl'].result_list), [user])
+
+    def test_paginator_counts_small_tables(self):
+        """
+        Small result sets are counted exactly.
+        """
+        self.create_users(3)
+        paginator = EstimatedCountPaginator(User.objects.order_by('id'), 2)
+
+        # The count should be exact.
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
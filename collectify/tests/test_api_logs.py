@@ -0,0 +1,48 @@
+import datetime
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import apilogs
+
+
+class APILogsTest(TestCase):
+
+    def test_get_sampling(self):
+        """
+        Only a sample of the successful GET requests is logged, other requests always are.
+        """
+        with self.settings(COLLECTIFY_API_LOG_GET_SAMPLE_RATE=0.1), mock.patch('random.random', return_value=0.5):
+            self.assertEqual(apilogs.logging_policy({'method': 'GET', 'status_class': '2xx'})['log'], False)
+            self.assertIsNone(apilogs.logging_policy({'method': 'GET', 'status_class': '4xx'}))
+            self.assertIsNone(apilogs.logging_policy({'method': 'POST', 'status_class': '2xx'}))
+
+        with self.settings(COLLECTIFY_API_LOG_GET_SAMPLE_RATE=0.1), mock.patch('random.random', return_value=0.05):
+            self.assertIsNone(apilogs.logging_policy({'method': 'GET', 'status_class': '2xx'}))
+
+    def test_prune(self):
+        """
+        Logs older than the retention window are deleted in batches.
+        """
+        model = apilogs.get_api_log_model()
+        if model is None:
+            self.skipTest('API logs are not stored in the database.')
+
+        now = timezone.now()
+        model.objects.bulk_create([
+            model(
+                api='/colors/', headers='{}', body='', method='GET', client_ip_address='127.0.0.1',
+                response='[]', status_code=200, execution_time=0.01, added_on=now - datetime.timedelta(days=days),
+            )
+            for days in [0, 1, 29, 31, 40, 60]
+        ])
+
+        output = io.StringIO()
+        call_command('prune_api_logs', '--days', '30', '--batch-size', '2', stdout=output)
+
+        self.assertIn('3 API logs', output.getvalue())
+        self.assertEqual(model.objects.count(), 3)
+        self.assertFalse(model.objects.filter(added_on__lt=now - datetime.timedelta(days=30)).exists())
@@ -1,22 +1,19 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.contrib.auth.models import User as AuthUser
-from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
 from rest_framework import status
 
-from ..models import Car, Color
+from ..models import Car, CarHasColor, Color
+from .utils import AuthenticatedAPITestCase
 
 
-class CarTest(APITestCase):
+class CarTest(AuthenticatedAPITestCase):
 
     def setUp(self):
         '''
         Prepare variables needed by every test.
         '''
-        # Authenticate.
-        self.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
-        self.token = Token.objects.create(user=self.authUser)
-        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        super().setUp()
 
         # Create links.
         self.car_list_endpoint = reverse('car-list')
@@ -245,6 +242,66 @@ class CarTest(APITestCase):
         # The attribute colors from car should not be an empty list.
         self.assertNotEqual(add_colors_response.data['colors'], [])
 
+    def test_update_car_without_changes(self):
+        """
+        An update keeping the name and the colors of a car writes nothing, a new color only adds its link.
+        """
+        # Create colors.
+        created_colors = [
+            self.client.post(self.color_list_endpoint, {'name': name}, format='json').data
+            for name in ['bleu_test', 'vert_test', 'rouge_test']
+        ]
+
+        # Create a car.
+        data = {'name': 'Tesla_test', 'colors': created_colors[:2]}
+        car = self.client.post(self.car_list_endpoint, data, format='json').data
+        car_detail_endpoint = reverse('car-detail', args=[car['id']])
+        links = list(CarHasColor.objects.values_list('id', flat=True))
+
+        # Send the same car again.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(car_detail_endpoint, car, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Nothing should be written.
+        self.assertFalse([query for query in queries if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')])
+
+        # Add a color.
+        car['colors'] = created_colors
+        response = self.client.put(car_detail_endpoint, car, format='json')
+
+        self.assertEqual(response.data['colors'], created_colors)
+        # The links of the kept colors should not be written again.
+        self.assertEqual(list(CarHasColor.objects.values_list('id', flat=True))[:2], links)
+
+    def test_partial_update_car_without_colors(self):
+        """
+        A partial update without colors keeps the colors of the car.
+        """
+        # Create colors.
+        created_colors = [
+            self.client.post(self.color_list_endpoint, {'name': name}, format='json').data
+            for name in ['bleu_test', 'vert_test']
+        ]
+
+        # Create a car.
+        car = self.client.post(self.car_list_endpoint, {'name': 'Tesla_test', 'colors': created_colors}, format='json').data
+        car_detail_endpoint = reverse('car-detail', args=[car['id']])
+
+        # Rename the car.
+        response = self.client.patch(car_detail_endpoint, {'name': 'BMW_test'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'BMW_test')
+        self.assertEqual(response.data['colors'], created_colors)
+
+        # An empty update changes nothing.
+        response = self.client.patch(car_detail_endpoint, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, dict(car, name='BMW_test'))
+        self.assertEqual(CarHasColor.objects.filter(car_id=car['id']).count(), 2)
+
     # DELETE
     def test_delete_car(self):
         # Create a car.
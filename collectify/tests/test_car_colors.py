@@ -0,0 +1,244 @@
+import io
+import threading
+from unittest import skipUnless
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+
+from ..models import CarHasColor, Change, Color, Car, User
+from ..schema import check_duplicate_car_colors
+from ..signals import color_list_refresh
+from .utils import AuthenticatedAPITestCase
+
+
+class CarColorListTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create colors.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+
+        # Create links.
+        self.car_list_endpoint = reverse('car-list')
+
+    def create_car(self, colors):
+        data = {'name': 'Tesla_test', 'colors': [{'name': color.name} for color in colors]}
+        return self.client.post(self.car_list_endpoint, data, format='json').data
+
+    def test_color_list_follows_writes(self):
+        """
+        The color list of a car follows its colors and their names.
+        """
+        car = self.create_car([self.blue, self.red])
+        # The color list should be written with the car.
+        self.assertEqual(Car.objects.get(id=car['id']).color_list, car['colors'])
+
+        # Rename a color.
+        self.client.put(reverse('color-detail', args=[self.blue.id]), {'name': 'marine_test'}, format='json')
+        self.assertEqual(Car.objects.get(id=car['id']).color_list[0], {'id': self.blue.id, 'name': 'marine_test'})
+
+        # Delete a color.
+        self.client.delete(reverse('color-detail', args=[self.red.id]))
+        self.assertEqual(Car.objects.get(id=car['id']).color_list, [{'id': self.blue.id, 'name': 'marine_test'}])
+
+        # Remove a link.
+        CarHasColor.objects.filter(car_id=car['id']).delete()
+        self.assertEqual(Car.objects.get(id=car['id']).color_list, [])
+
+    @override_settings(COLLECTIFY_DENORMALIZED_CAR_COLORS=True)
+    def test_read_denormalized_colors(self):
+        """
+        Car lists and details are read from the cars table only.
+        """
+        created_cars = [self.create_car([]), self.create_car([self.blue]), self.create_car([self.blue, self.red])]
+
+        # The list should be read from the cars table only, after the token authentication:
+        # the versions of the cars, then the cars missing from the representation cache.
+        with self.assertNumQueries(3):
+            list_response = self.client.get(self.car_list_endpoint)
+
+        # Cars from response should be the same as created cars.
+        self.assertEqual(list_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list_response.data, created_cars)
+
+        retrieve_response = self.client.get(reverse('car-detail', args=[created_cars[2]['id']]))
+        self.assertEqual(retrieve_response.data, created_cars[2])
+
+    def test_repair_command(self):
+        """
+        The repair command rebuilds the color lists out of sync.
+        """
+        car = self.create_car([self.blue])
+        Car.objects.update(color_list=[])
+
+        output = io.StringIO()
+        call_command('repair_car_colors', stdout=output)
+
+        # The color list should be rebuilt.
+        self.assertIn('1 cars checked, 1 repaired.', output.getvalue())
+        self.assertEqual(Car.objects.get(id=car['id']).color_list, [{'id': self.blue.id, 'name': 'bleu_test'}])
+
+
+class CarColorUserTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create colors and a car painted in both.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+        self.car = Car.objects.create(name='Tesla_test')
+        CarHasColor.objects.create(car=self.car, color=self.blue)
+        CarHasColor.objects.create(car=self.car, color=self.red)
+
+    def create_user(self, color):
+        return User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                   has_driver_licence=True, car=self.car, color=color)
+
+    def test_removed_car_colors_leave_users(self):
+        """
+        Removing a color from a car removes it from the users of the car.
+        """
+        blue_user = self.create_user(self.blue)
+        red_user = self.create_user(self.red)
+        updated_at = blue_user.updated_at
+
+        # Remove the blue color from the car.
+        data = {'name': 'Tesla_test', 'colors': [{'name': 'rouge_test'}]}
+        self.client.put(reverse('car-detail', args=[self.car.id]), data, format='json')
+
+        blue_user.refresh_from_db()
+        self.assertIsNone(blue_user.color_id)
+        self.assertEqual(blue_user.car_id, self.car.id)
+        # The users should be updated and their changes recorded.
+        self.assertGreater(blue_user.updated_at, updated_at)
+        self.assertTrue(Change.objects.filter(model='user', object_id=blue_user.id).exists())
+
+        # Delete the red link.
+        CarHasColor.objects.get(car=self.car, color=self.red).delete()
+        red_user.refresh_from_db()
+        self.assertIsNone(red_user.color_id)
+
+    def test_partial_update_keeps_car_and_color(self):
+        """
+        A partial update keeps the car and color of the user, without reading the car colors.
+        """
+        user = self.create_user(self.blue)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse('user-detail', args=[user.id]), {'lastname': 'Doe_test'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['car_id'], response.data['color_id']), (self.car.id, self.blue.id))
+        self.assertFalse([query for query in queries if 'collectify_car_has_color' in query['sql']])
+
+        # A color of another car is removed.
+        other_car = Car.objects.create(name='Renault_test')
+        response = self.client.patch(reverse('user-detail', args=[user.id]), {'car_id': other_car.id}, format='json')
+        self.assertEqual((response.data['car_id'], response.data['color_id']), (other_car.id, None))
+
+    def test_admin_validation(self):
+        """
+        A color that is not one of the car colors is refused by the model validation.
+        """
+        CarHasColor.objects.filter(color=self.red).delete()
+        user = User(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25',
+                    has_driver_licence=True, car=self.car, color=self.red)
+
+        with self.assertRaises(ValidationError) as context:
+            user.full_clean()
+        self.assertIn('color', context.exception.message_dict)
+
+    @skipUnless(connection.vendor == 'postgresql', 'The consistency is enforced by PostgreSQL only.')
+    def test_database_consistency(self):
+        """
+        PostgreSQL refuses users whose color is not one of their car colors, and removes deleted car colors from users.
+        """
+        other_car = Car.objects.create(name='Renault_test')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=other_car, color=self.blue)
+            connection.check_constraints()
+
+        if connection.pg_version < 150000:
+            return
+
+        # Delete a link without the ORM.
+        user = self.create_user(self.blue)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM collectify_car_has_color WHERE car_id = %s AND color_id = %s', [self.car.id, self.blue.id])
+
+        user.refresh_from_db()
+        self.assertEqual((user.car_id, user.color_id), (self.car.id, None))
+
+
+    @skipUnless(connection.vendor == 'postgresql', 'The constraint is dropped in the test transaction on PostgreSQL only.')
+    def test_delete_duplicates(self):
+        """
+        Migrations stop while a color is linked twice to a car, until the repair command deletes the duplicate.
+        """
+        user = self.create_user(self.blue)
+        with connection.cursor() as cursor:
+            # The table cannot be altered while the checks of deferred constraints are pending.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('ALTER TABLE collectify_car_has_color DROP CONSTRAINT collectify_car_has_color_unique CASCADE')
+            cursor.execute('INSERT INTO collectify_car_has_color (car_id, color_id) VALUES (%s, %s)', [self.car.id, self.blue.id])
+
+        with self.assertRaisesMessage(CommandError, 'repair_car_colors --delete-duplicates'):
+            check_duplicate_car_colors()
+
+        output = io.StringIO()
+        call_command('repair_car_colors', '--delete-duplicates', stdout=output)
+
+        self.assertIn('1 duplicate car colors deleted, the color lists of 1 cars rebuilt.', output.getvalue())
+        self.assertEqual(CarHasColor.objects.filter(car=self.car).count(), 2)
+        self.assertEqual(len(Car.objects.get(id=self.car.id).color_list), 2)
+        # The users keep their color.
+        user.refresh_from_db()
+        self.assertEqual(user.color_id, self.blue.id)
+        check_duplicate_car_colors()
+
+# Each thread writes in its own committed transaction, so the test does not run in a transaction.
+@skipUnless(connection.vendor == 'postgresql', 'Concurrent transactions need PostgreSQL.')
+class CarColorListConcurrencyTest(TransactionTestCase):
+
+    def test_concurrent_links(self):
+        """
+        Colors added to a car by concurrent transactions are all kept in its color list.
+        """
+        car = Car.objects.create(name='Tesla_test')
+        colors = [Color.objects.create(name='bleu_test'), Color.objects.create(name='rouge_test')]
+        linked = threading.Barrier(len(colors))
+
+        def add_color(color):
+            try:
+                with transaction.atomic(), color_list_refresh():
+                    CarHasColor.objects.create(car=car, color=color)
+                    # Both links are written before either color list is refreshed.
+                    linked.wait(timeout=10)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add_color, args=[color]) for color in colors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        car.refresh_from_db()
+        self.assertEqual(sorted(color['name'] for color in car.color_list), ['bleu_test', 'rouge_test'])
@@ -0,0 +1,91 @@
+import gzip
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User as AuthUser
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITransactionTestCase
+from rest_framework import status
+
+from ..catalogue import catalogue
+from ..models import Car, CarHasColor, Color, User
+from .utils import wait_for_older_transactions
+
+
+# The catalogue reads the committed changes, so the tests do not run in a transaction.
+@override_settings(COLLECTIFY_CATALOGUE_CHECK_INTERVAL=0)
+class CatalogueTest(APITransactionTestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        # Authenticate.
+        self.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
+        self.token = Token.objects.create(user=self.authUser)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        # Create links.
+        self.catalogue_endpoint = reverse('catalogue')
+
+        # Create colors and cars.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+        self.car = Car.objects.create(name='Tesla_test')
+        CarHasColor.objects.create(car=self.car, color=self.blue)
+
+        catalogue.reset()
+        self.addCleanup(catalogue.reset)
+
+    def get_catalogue(self, **headers):
+        wait_for_older_transactions()
+        response = self.client.get(self.catalogue_endpoint, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_catalogue(self):
+        """
+        The catalogue lists the cars with their colors and the colors, with a strong ETag.
+        """
+        response = self.get_catalogue()
+        data = json.loads(response.content)
+
+        self.assertEqual(data['cars'], [{'id': self.car.id, 'name': 'Tesla_test', 'colors': [{'id': self.blue.id, 'name': 'bleu_test'}]}])
+        self.assertEqual(data['colors'], [{'id': self.blue.id, 'name': 'bleu_test'}, {'id': self.red.id, 'name': 'rouge_test'}])
+        self.assertEqual(response['ETag'], f'"{data["version"]}"')
+
+        # A client with the current version gets a 304.
+        response = self.client.get(self.catalogue_endpoint, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # The compressed catalogue is the same.
+        response = self.get_catalogue(HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), data)
+
+    def test_incremental_update(self):
+        """
+        Only the cars and colors changed since the last read are read again.
+        """
+        version = json.loads(self.get_catalogue().content)['version']
+
+        # Writes to users do not change the catalogue.
+        User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25')
+        response = self.get_catalogue()
+        self.assertEqual(json.loads(response.content)['version'], version)
+
+        # Paint the car in red, and delete the blue color.
+        self.client.put(reverse('car-detail', args=[self.car.id]), {'name': 'Tesla_test', 'colors': [{'name': 'rouge_test'}]}, format='json')
+        self.client.delete(reverse('color-detail', args=[self.blue.id]))
+
+        with CaptureQueriesContext(connection) as queries:
+            data = json.loads(self.get_catalogue().content)
+
+        self.assertNotEqual(data['version'], version)
+        self.assertEqual(data['cars'], [{'id': self.car.id, 'name': 'Tesla_test', 'colors': [{'id': self.red.id, 'name': 'rouge_test'}]}])
+        self.assertEqual(data['colors'], [{'id': self.red.id, 'name': 'rouge_test'}])
+        # Only the changed car, its colors and the changed color should be read.
+        self.assertFalse([query for query in queries if 'collectify_cars' in query['sql'] and 'IN (' not in query['sql']])
@@ -0,0 +1,114 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User as AuthUser
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITransactionTestCase
+from rest_framework import status
+
+from ..models import Change, Color, User
+from .utils import wait_for_older_transactions
+
+
+# Changes are only read once committed, so the tests do not run in a transaction.
+class ChangeFeedTest(APITransactionTestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        # Authenticate.
+        self.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
+        self.token = Token.objects.create(user=self.authUser)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        # Create links.
+        self.changes_endpoint = reverse('change-list')
+
+    def get_changes(self, **params):
+        wait_for_older_transactions()
+        response = self.client.get(self.changes_endpoint, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_changes_since_cursor(self):
+        """
+        The feed returns the changes after a cursor, with the current data of the saved objects.
+        """
+        blue = self.client.post(reverse('color-list'), {'name': 'bleu_test'}, format='json').data
+        car = self.client.post(reverse('car-list'), {'name': 'Tesla_test', 'colors': [{'name': 'bleu_test'}]}, format='json').data
+
+        changes = self.get_changes()
+        # The color and the car should be listed once, in the order of their last write.
+        self.assertEqual([(change['model'], change['id'], change['action']) for change in changes['results']],
+                         [('color', blue['id'], 'save'), ('car', car['id'], 'save')])
+        self.assertEqual(changes['results'][1]['data'], car)
+        self.assertFalse(changes['more'])
+
+        # Nothing changed since the cursor.
+        self.assertEqual(self.get_changes(since=changes['next'])['results'], [])
+
+        # Delete the color.
+        self.client.delete(reverse('color-detail', args=[blue['id']]))
+        deletions = self.get_changes(since=changes['next'])
+
+        # The color should be a tombstone and the car should come without its color.
+        self.assertEqual(deletions['results'][0]['model'], 'color')
+        self.assertEqual(deletions['results'][0]['action'], 'delete')
+        self.assertIsNone(deletions['results'][0]['data'])
+        self.assertEqual(deletions['results'][-1]['data']['colors'], [])
+
+    def test_changes_pages(self):
+        """
+        The feed is read in pages of "limit" changes.
+        """
+        colors = [Color.objects.create(name=f'color_{index}') for index in range(5)]
+
+        first_page = self.get_changes(limit=3)
+        second_page = self.get_changes(since=first_page['next'], limit=3)
+
+        self.assertTrue(first_page['more'])
+        self.assertFalse(second_page['more'])
+        self.assertEqual([change['id'] for change in first_page['results'] + second_page['results']],
+                         [color.id for color in colors])
+
+    def test_bulk_changes(self):
+        """
+        Bulk updates and deletions are recorded.
+        """
+        users = [User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25')
+                 for index in range(3)]
+        cursor = self.get_changes()['next']
+
+        self.client.patch(reverse('user-bulk'), {'ids': [users[0].id, users[1].id], 'data': {'lastname': 'Martin_test'}},
+                          format='json')
+        self.client.delete(reverse('user-bulk'), {'ids': [users[2].id]}, format='json')
+
+        changes = self.get_changes(since=cursor)['results']
+        self.assertEqual([(change['id'], change['action']) for change in changes],
+                         [(users[0].id, 'save'), (users[1].id, 'save'), (users[2].id, 'delete')])
+        self.assertEqual(changes[0]['data']['lastname'], 'Martin_test')
+
+    def test_invalid_cursor(self):
+        """
+        A malformed cursor is rejected.
+        """
+        response = self.client.get(self.changes_endpoint, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune(self):
+        """
+        Changes older than the retention window are deleted in batches.
+        """
+        colors = [Color.objects.create(name=f'color_{days}') for days in [0, 1, 8, 30]]
+        for color, days in zip(colors, [0, 1, 8, 30]):
+            Change.objects.filter(object_id=color.id).update(changed_at=timezone.now() - datetime.timedelta(days=days))
+
+        output = io.StringIO()
+        call_command('prune_changes', '--days', '7', '--batch-size', '1', stdout=output)
+
+        self.assertIn('2 changes older than 7 days deleted.', output.getvalue())
+        self.assertEqual([change['id'] for change in self.get_changes()['results']], [color.id for color in colors[:2]])
@@ -1,21 +1,16 @@
 from django.urls import reverse
-from django.contrib.auth.models import User as AuthUser
-from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
 from rest_framework import status
 
 from ..models import Color
+from .utils import AuthenticatedAPITestCase
 
-class ColorTest(APITestCase):
+class ColorTest(AuthenticatedAPITestCase):
 
     def setUp(self):
         '''
         Prepare variables needed by every test.
         '''
-        # Authenticate.
-        self.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
-        self.token = Token.objects.create(user=self.authUser)
-        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        super().setUp()
 
         # Create color link.
         self.color_list_endpoint = reverse('color-list')
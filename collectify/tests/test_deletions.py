@@ -0,0 +1,77 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+
+from ..models import CarHasColor, Color, Car, Job, User
+from .utils import AuthenticatedAPITestCase
+
+
+class DeletionTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create colors, cars and their drivers.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+        self.tesla = Car.objects.create(name='Tesla_test')
+        self.bmw = Car.objects.create(name='BMW_test')
+        for car in (self.tesla, self.bmw):
+            CarHasColor.objects.create(car=car, color=self.blue)
+            CarHasColor.objects.create(car=car, color=self.red)
+
+        for index in range(5):
+            User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=self.tesla, color=self.blue)
+
+    def run_jobs(self):
+        # Delete in batches of 2 rows.
+        output = io.StringIO()
+        with mock.patch('collectify.deletions.BATCH_SIZE', 2):
+            call_command('run_workers', '--once', stdout=output)
+        return output.getvalue()
+
+    def test_async_car_deletion(self):
+        """
+        A car deleted in the background is deleted with its users and links by the worker.
+        """
+        response = self.client.delete(reverse('car-detail', args=[self.tesla.id]) + '?async=true')
+
+        # The deletion should only be recorded.
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.PENDING)
+        self.assertTrue(Car.objects.filter(id=self.tesla.id).exists())
+
+        # The same deletion should be returned while it is pending.
+        self.assertEqual(self.client.delete(reverse('car-detail', args=[self.tesla.id]) + '?async=1').data['id'],
+                         response.data['id'])
+
+        output = self.run_jobs()
+
+        # The car, its users and its links should be deleted.
+        self.assertIn(f'delete job {response.data["id"]} done', output)
+        self.assertFalse(Car.objects.filter(id=self.tesla.id).exists())
+        self.assertEqual(User.objects.count(), 0)
+        self.assertEqual(CarHasColor.objects.filter(car=self.bmw).count(), 2)
+
+        job = self.client.get(response['Location']).data
+        self.assertEqual(job['status'], Job.DONE)
+        self.assertEqual(job['progress'], {'deleted': 8, 'total': 8})
+
+    def test_async_color_deletion(self):
+        """
+        A color deleted in the background is removed from the color list of its cars.
+        """
+        response = self.client.delete(reverse('color-detail', args=[self.red.id]) + '?async=true')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.run_jobs()
+
+        self.assertFalse(Color.objects.filter(id=self.red.id).exists())
+        self.assertEqual(Car.objects.get(id=self.bmw.id).color_list, [{'id': self.blue.id, 'name': 'bleu_test'}])
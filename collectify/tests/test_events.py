@@ -0,0 +1,93 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection, transaction
+from django.test import override_settings
+
+from ..events import MAX_EVENT_IDS, EventStream, get_broker, send_event
+from ..models import Color
+from .utils import AuthenticatedAPITestCase
+
+
+class EventStreamTest(AuthenticatedAPITestCase):
+
+    def get_scope(self, query_string=b'', token=None):
+        headers = [(b'authorization', f'Token {token}'.encode())] if token else []
+        return {'type': 'http', 'method': 'GET', 'path': '/events/', 'query_string': query_string, 'headers': headers}
+
+    def create_color(self, name):
+        # The events are sent when the transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return Color.objects.create(name=name)
+
+    @async_to_sync
+    async def stream(self, scope, write):
+        """
+        Run the event stream, apply write once connected and return the response messages
+        """
+        messages = []
+        disconnected = asyncio.Event()
+        received = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.body' and message['body'].startswith(b'event:'):
+                received.set()
+
+        stream = asyncio.ensure_future(EventStream()(scope, receive, send))
+        while not messages and not stream.done():
+            await asyncio.sleep(0.01)
+
+        if not stream.done():
+            await sync_to_async(write)()
+            await asyncio.wait_for(received.wait(), timeout=5)
+            disconnected.set()
+
+        await stream
+        return messages
+
+    def test_push_saves(self):
+        """
+        Saves are pushed to the subscribed streams.
+        """
+        created = []
+        messages = self.stream(self.get_scope(token=self.token.key), lambda: created.append(self.create_color('bleu_test')))
+
+        self.assertEqual(messages[0]['status'], 200)
+        body = b''.join(message.get('body', b'') for message in messages[1:]).decode()
+        event = json.loads(body.split('event: save\ndata: ')[1].split('\n')[0])
+        self.assertEqual(event, {'model': 'color', 'action': 'save', 'ids': [created[0].id]})
+
+        # The stream should unsubscribe when the client disconnects.
+        self.assertEqual(get_broker().subscriptions, set())
+
+    def test_token_required(self):
+        """
+        A stream without a valid token is refused.
+        """
+        messages = self.stream(self.get_scope(query_string=b'token=invalid'), lambda: None)
+        self.assertEqual(messages[0]['status'], 401)
+
+    def test_large_event(self):
+        """
+        Events of many objects are sent without their ids, which would not fit a NOTIFY payload.
+        """
+        ids = list(range(1, 10001))
+        with mock.patch.object(get_broker(), 'send') as send:
+            send_event('user', 'delete', ids)
+            send_event('user', 'delete', ids[:MAX_EVENT_IDS])
+
+        self.assertEqual(send.call_args_list[0].args[0], {'model': 'user', 'action': 'delete', 'ids': None})
+        self.assertEqual(send.call_args_list[1].args[0]['ids'], ids[:MAX_EVENT_IDS])
+
+        # The largest event fits a NOTIFY payload.
+        if connection.vendor == 'postgresql':
+            with override_settings(COLLECTIFY_EVENT_BROKER={'BACKEND': 'collectify.events.PostgresBroker'}):
+                with transaction.atomic():
+                    send_event('user', 'delete', [2 ** 63 - 1] * MAX_EVENT_IDS)
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import CarHasColor, Color, Car, User
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        # Create a color, a car and users.
+        self.color = Color.objects.create(name='bleu_test')
+        self.car = Car.objects.create(name='Tesla_test')
+        CarHasColor.objects.create(car=self.car, color=self.color)
+        self.users = [
+            User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=self.car, color=self.color)
+            for index in range(5)
+        ]
+
+    def call_export(self, **options):
+        """
+        Run the export and return its output
+        """
+        output = io.StringIO()
+        call_command('export_collectify', output=self.directory.name, stdout=output, **options)
+        return output.getvalue()
+
+    def test_export_csv(self):
+        """
+        Export every table to CSV in small chunks.
+        """
+        output = self.call_export(chunk_size=2)
+
+        # There should be one file per table.
+        self.assertIn('users.csv: 5 rows', output)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['car_colors.csv', 'cars.csv', 'colors.csv', 'users.csv'])
+
+        with open(os.path.join(self.directory.name, 'users.csv')) as file:
+            rows = list(csv.DictReader(file))
+
+        # Every user should be exported.
+        self.assertEqual([row['firstname'] for row in rows], [user.firstname for user in self.users])
+        # Foreign keys should be exported as ids.
+        self.assertEqual(rows[0]['car_id'], str(self.car.id))
+        self.assertEqual(rows[0]['date_of_birth'], '1990-01-25')
+
+    def test_export_ndjson_by_ranges(self):
+        """
+        Export users to NDJSON files split by id range.
+        """
+        self.call_export(format='ndjson', tables='users', ranges=2)
+
+        # There should be one file per range.
+        names = sorted(os.listdir(self.directory.name))
+        self.assertEqual(names, ['users-0001.ndjson', 'users-0002.ndjson'])
+
+        rows = []
+        for name in names:
+            with open(os.path.join(self.directory.name, name)) as file:
+                rows.extend(json.loads(line) for line in file)
+
+        # Ranges should hold every user once.
+        self.assertEqual([row['id'] for row in rows], [user.id for user in self.users])
+        self.assertEqual(rows[0]['has_driver_licence'], True)
@@ -0,0 +1,124 @@
+import datetime
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from ..models import Car, IdempotencyKey, User
+from .utils import AuthenticatedAPITestCase
+
+
+class IdempotencyTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Prepare user data.
+        self.user_data = {
+            'firstname': 'Henry_test',
+            'lastname': 'Dupont_test',
+            'date_of_birth': '1990-01-25',
+        }
+
+        # Create links.
+        self.user_list_endpoint = reverse('user-list')
+        self.car_list_endpoint = reverse('car-list')
+
+    def post_user(self, data, key='key_test'):
+        return self.client.post(self.user_list_endpoint, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_is_replayed(self):
+        """
+        A retried request is answered with the first response.
+        """
+        first_response = self.post_user(self.user_data)
+        retry_response = self.post_user(self.user_data)
+
+        # Both responses should be the same creation.
+        self.assertEqual(first_response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry_response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry_response.data, first_response.data)
+        # The retry should be marked as replayed.
+        self.assertEqual(retry_response['Idempotent-Replayed'], 'true')
+        # There should be 1 user in the database.
+        self.assertEqual(User.objects.count(), 1)
+
+        # Another key should create another user.
+        self.post_user(self.user_data, key='other_key_test')
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_key_reused_for_another_request(self):
+        """
+        A key cannot be reused with different data.
+        """
+        self.post_user(self.user_data)
+        response = self.post_user({**self.user_data, 'firstname': 'John_test'})
+
+        # Response status code should be 422.
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        # There should be 1 user in the database.
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_concurrent_retry(self):
+        """
+        A retry received while the first request runs is refused.
+        """
+        # Simulate a running request.
+        self.post_user(self.user_data)
+        IdempotencyKey.objects.update(status_code=None, response=None)
+
+        response = self.post_user(self.user_data)
+
+        # Response status code should be 409.
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        # There should be 1 user in the database.
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_lost_request(self):
+        """
+        A retry runs again once the lease of a request that never finished has ended.
+        """
+        # Simulate a request whose worker died.
+        self.post_user(self.user_data)
+        IdempotencyKey.objects.update(status_code=None, response=None, expires_at=timezone.now() + datetime.timedelta(seconds=60))
+        self.assertEqual(self.post_user(self.user_data).status_code, status.HTTP_409_CONFLICT)
+
+        # End the lease.
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        response = self.post_user(self.user_data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User.objects.count(), 2)
+        # The response should be replayed for the whole TTL.
+        self.assertGreater(IdempotencyKey.objects.get().expires_at, timezone.now() + datetime.timedelta(hours=23))
+
+    def test_expired_key(self):
+        """
+        A request with an expired key runs again.
+        """
+        self.post_user(self.user_data)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        response = self.post_user(self.user_data)
+
+        # Response status code should be 201.
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        # There should be 2 users in the database.
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_failed_request_releases_key(self):
+        """
+        A request refused by validation can be retried with the same key.
+        """
+        invalid_response = self.client.post(self.car_list_endpoint, {'name': 'Tesla_test'}, format='json', HTTP_IDEMPOTENCY_KEY='car_key')
+        response = self.client.post(self.car_list_endpoint, {'name': 'Tesla_test', 'colors': []}, format='json', HTTP_IDEMPOTENCY_KEY='car_key')
+
+        # The invalid request should not be stored.
+        self.assertEqual(invalid_response.status_code, status.HTTP_400_BAD_REQUEST)
+        # The retry should create the car.
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Car.objects.count(), 1)
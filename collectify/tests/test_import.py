@@ -0,0 +1,121 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import CarHasColor, Color, Car, ImportCheckpoint, User
+
+
+class ImportTest(TestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def call_import(self, **options):
+        """
+        Run the import and return its output and its errors
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_collectify', stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_colors_and_cars(self):
+        """
+        Import colors and cars from CSV files.
+        """
+        colors = self.write_file('colors.csv', 'name\nbleu_test\nvert_test\nbleu_test\n')
+        cars = self.write_file('cars.csv', 'name,colors\nTesla_test,bleu_test|vert_test\nBMW_test,\nFiat_test,jaune_test\n')
+
+        self.call_import(colors=colors, cars=cars, batch_size=2)
+
+        # Color names should not be duplicated.
+        self.assertEqual(Color.objects.count(), 2)
+        # The car with an unknown color should be rejected.
+        self.assertEqual(Car.objects.count(), 2)
+        # Car colors should be linked by name.
+        tesla = Car.objects.get(name='Tesla_test')
+        self.assertEqual(sorted(color.name for color in tesla.colors.all()), ['bleu_test', 'vert_test'])
+        self.assertEqual(CarHasColor.objects.count(), 2)
+
+    def test_import_users_applies_car_and_color_rules(self):
+        """
+        Import users from an NDJSON file with the rules of the users endpoint.
+        """
+        blue = Color.objects.create(name='bleu_test')
+        red = Color.objects.create(name='rouge_test')
+        car = Car.objects.create(name='Tesla_test')
+        CarHasColor.objects.create(car=car, color=blue)
+
+        rows = [
+            {'firstname': 'Henry_test', 'lastname': 'Dupont_test', 'date_of_birth': '1990-01-25',
+             'has_driver_licence': True, 'car_id': car.id, 'color_id': blue.id},
+            {'firstname': 'John_test', 'lastname': 'Doe_test', 'date_of_birth': '1978-07-16',
+             'has_driver_licence': True, 'car_id': car.id, 'color_id': red.id},
+            {'firstname': 'David_test', 'lastname': 'Smith_test', 'date_of_birth': '1985-03-02',
+             'has_driver_licence': False, 'car_id': car.id, 'color_id': blue.id},
+            {'firstname': 'Invalid_test', 'lastname': 'Date_test', 'date_of_birth': 'not a date'},
+        ]
+        users = self.write_file('users.ndjson', '\n'.join(json.dumps(row) for row in rows))
+
+        output, errors = self.call_import(users=users, batch_size=3)
+
+        # The row with an invalid date should be rejected.
+        self.assertEqual(User.objects.count(), 3)
+        self.assertIn('users: row 4 rejected', errors)
+        self.assertIn('users: 3 rows imported', output)
+        # A user can keep a color of the car.
+        henry = User.objects.get(firstname='Henry_test')
+        self.assertEqual((henry.car_id, henry.color_id), (car.id, blue.id))
+        self.assertEqual(henry.date_of_birth, datetime.date(1990, 1, 25))
+        # A color that is not a color of the car should be removed.
+        john = User.objects.get(firstname='John_test')
+        self.assertEqual((john.car_id, john.color_id), (car.id, None))
+        # A user without driver licence should not have a car nor a color.
+        david = User.objects.get(firstname='David_test')
+        self.assertEqual((david.car_id, david.color_id), (None, None))
+
+        # The checkpoint should record the import.
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual((checkpoint.rows_read, checkpoint.rows_imported, checkpoint.rows_rejected), (4, 3, 1))
+
+    def test_resume_import(self):
+        """
+        Resume an interrupted import after the rows already imported.
+        """
+        users = self.write_file('users.csv', (
+            'firstname,lastname,date_of_birth\n'
+            'Henry_test,Dupont_test,1990-01-25\n'
+            'John_test,Doe_test,1978-07-16\n'
+            'David_test,Smith_test,1985-03-02\n'
+        ))
+
+        # Simulate a run interrupted after the first row.
+        ImportCheckpoint.objects.create(source=f'users:{os.path.abspath(users)}', rows_read=1, rows_imported=1)
+        User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25')
+
+        output, _ = self.call_import(users=users, resume=True)
+
+        # Only the remaining rows should be imported.
+        self.assertIn('users: resuming after 1 rows.', output)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(User.objects.filter(firstname='Henry_test').count(), 1)
+
+        # Resuming a completed import should not import anything.
+        output, _ = self.call_import(users=users, resume=True)
+        self.assertIn('already imported', output)
+        self.assertEqual(User.objects.count(), 3)
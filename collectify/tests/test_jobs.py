@@ -0,0 +1,138 @@
+import datetime
+import io
+import time
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import F
+from django.urls import reverse
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from ..jobs import claim_job, enqueue, run_job
+from ..models import Color, Job
+from .utils import AuthenticatedAPITestCase
+
+
+# Handlers of the test jobs.
+def add_color(job):
+    return {'id': Color.objects.create(name=job.payload['name']).id}
+
+
+def fail(job):
+    raise RuntimeError('Failed on purpose.')
+
+
+def take_over(job):
+    # Another worker claims the job meanwhile.
+    Job.objects.filter(id=job.id).update(attempts=F('attempts') + 1, updated_at=timezone.now())
+    return {'done': True}
+
+
+def wait_for_heartbeat(job):
+    time.sleep(0.5)
+    return {'updated_at': Job.objects.get(id=job.id).updated_at.isoformat()}
+
+
+@override_settings(COLLECTIFY_JOB_HANDLERS={
+    'add_color': 'collectify.tests.test_jobs.add_color',
+    'fail': 'collectify.tests.test_jobs.fail',
+    'take_over': 'collectify.tests.test_jobs.take_over',
+})
+class JobTest(AuthenticatedAPITestCase):
+
+    def run_workers(self):
+        call_command('run_workers', '--once', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_priorities(self):
+        """
+        Jobs run by decreasing priority, then in creation order.
+        """
+        jobs = [enqueue('add_color', {'name': 'bleu_test'}), enqueue('add_color', {'name': 'rouge_test'}, priority=1)]
+        self.run_workers()
+
+        self.assertEqual(list(Color.objects.order_by('id').values_list('name', flat=True)), ['rouge_test', 'bleu_test'])
+
+        # The job should be done with its result.
+        response = self.client.get(reverse('job-detail', args=[jobs[0].id]))
+        self.assertEqual(response.data['status'], Job.DONE)
+        self.assertEqual(response.data['result'], {'id': Color.objects.get(name='bleu_test').id})
+
+    def test_retries(self):
+        """
+        A failed job is retried later, until its last attempt.
+        """
+        job = enqueue('fail', max_attempts=2)
+
+        run_job(claim_job())
+        job.refresh_from_db()
+        # The job should wait for its retry.
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(claim_job())
+
+        Job.objects.update(run_after=timezone.now())
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('Failed on purpose.', job.error)
+
+    def test_command_job(self):
+        """
+        Management commands are enqueued and run as jobs.
+        """
+        output = io.StringIO()
+        call_command('enqueue_command', 'repair_car_colors', '--dry-run', stdout=output)
+        self.run_workers()
+
+        job = Job.objects.get()
+        self.assertIn(f'Job {job.id} enqueued.', output.getvalue())
+        self.assertEqual(job.payload, {'name': 'repair_car_colors', 'args': ['--dry-run']})
+        self.assertIn('0 cars checked, 0 out of sync.', job.result['output'])
+
+    def test_taken_over_job(self):
+        """
+        A worker whose job was taken over by another worker does not save its outcome.
+        """
+        job = enqueue('take_over')
+        run_job(claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.RUNNING, 2, None))
+
+
+    def test_lost_worker(self):
+        """
+        A stale job is taken over until its last attempt, then fails.
+        """
+        job = enqueue('add_color', {'name': 'bleu_test'}, max_attempts=2)
+
+        # The worker dies while running the job, twice.
+        for attempts in (1, 2):
+            self.assertEqual(claim_job().attempts, attempts)
+            Job.objects.update(updated_at=timezone.now() - datetime.timedelta(minutes=10))
+
+        self.assertIsNone(claim_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (Job.FAILED, 2, 'The worker running the job was lost.'))
+
+# The heartbeat updates the job from another connection, so the test does not run in a transaction.
+@override_settings(COLLECTIFY_JOB_HANDLERS={'wait_for_heartbeat': 'collectify.tests.test_jobs.wait_for_heartbeat'})
+class JobHeartbeatTest(TransactionTestCase):
+
+    @mock.patch('collectify.jobs.HEARTBEAT_INTERVAL', 0.1)
+    def test_heartbeat(self):
+        """
+        A running job is updated by its worker, so that other workers do not take it over.
+        """
+        enqueue('wait_for_heartbeat')
+        job = claim_job()
+        stale_at = timezone.now() - datetime.timedelta(minutes=10)
+        Job.objects.update(updated_at=stale_at)
+
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        # The job should have been updated while its handler ran.
+        self.assertGreater(datetime.datetime.fromisoformat(job.result['updated_at']), stale_at)
@@ -0,0 +1,75 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, SimpleTestCase
+from django.contrib.auth.models import User as AuthUser
+from rest_framework.authtoken.models import Token
+
+from ..management.commands.load_test import LOAD_TEST_LASTNAME, LOAD_TEST_MARKER, Workload, parse_mix, percentile, run_level
+from ..models import CarHasColor, Color, Car, User
+
+
+class LoadTestReportTest(SimpleTestCase):
+
+    def test_parse_mix(self):
+        """
+        A mix gives the weight of every operation, 1 by default.
+        """
+        self.assertEqual(parse_mix('retrieve_user=3,create_user'), {'retrieve_user': 3.0, 'create_user': 1.0})
+
+        # Operations must exist and weights be numbers.
+        for mix in ['drop_tables=1', '__init__=1', 'retrieve_user=often', 'retrieve_user=0']:
+            with self.assertRaises(CommandError):
+                parse_mix(mix)
+
+    def test_percentile(self):
+        """
+        Percentiles are the nearest ranks of the sorted values.
+        """
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, fraction) for fraction in (0.5, 0.9, 0.99, 1)], [50, 90, 99, 100])
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+
+class LoadTestRunTest(LiveServerTestCase):
+
+    def test_run_level(self):
+        """
+        Clients replay the mix on the server and their requests are summarized.
+        """
+        token = Token.objects.create(user=AuthUser.objects.create_superuser('test_user', '', 'test_password'))
+        blue = Color.objects.create(name='bleu_test')
+        car = Car.objects.create(name='Tesla_test')
+        CarHasColor.objects.create(car=car, color=blue)
+        user = User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25')
+
+        mix = {'retrieve_user': 2, 'retrieve_car': 1, 'create_user': 1}
+        summary = run_level(self.live_server_url, [token.key], Workload([user.id], [car.id]), mix, 2, 0.5)
+
+        self.assertGreater(summary['requests'], 0)
+        self.assertEqual(summary['error_rate'], 0)
+        self.assertLessEqual(set(summary['operations']), set(mix))
+        self.assertLessEqual(summary['p50'], summary['p99'])
+        self.assertEqual(User.objects.filter(lastname=LOAD_TEST_LASTNAME).count(), summary['operations'].get('create_user', {}).get('requests', 0))
+
+    def test_command_writes_its_own_users(self):
+        """
+        The command only writes the users it seeded and created, and deletes its accounts after the run.
+        """
+        user = User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25')
+
+        call_command(
+            'load_test', url=self.live_server_url, seed_colors=2, seed_cars=2, seed_users=3,
+            mix='update_user=1,create_user=1', concurrency='2', duration=0.5, warmup=0, stdout=io.StringIO(),
+        )
+
+        # Other users should not be written.
+        user.refresh_from_db()
+        self.assertEqual(user.firstname, 'Henry_test')
+        self.assertEqual(User.objects.filter(lastname__endswith=LOAD_TEST_MARKER).count(), 3)
+        # Created users, accounts and tokens should be deleted.
+        self.assertFalse(User.objects.filter(lastname=LOAD_TEST_LASTNAME).exists())
+        self.assertFalse(AuthUser.objects.exists())
+        self.assertFalse(Token.objects.exists())
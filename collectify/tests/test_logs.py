@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.urls import reverse
+from rest_framework import status
+
+from .. import logs
+from .utils import AuthenticatedAPITestCase
+
+
+class LogsTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create links.
+        self.color_list_endpoint = reverse('color-list')
+
+    def test_access_log(self):
+        """
+        Every request is logged with its request id, latency and query count.
+        """
+        with self.assertLogs('collectify.access', 'INFO') as captured:
+            response = self.client.post(self.color_list_endpoint, {'name': 'bleu_test'}, format='json', HTTP_X_REQUEST_ID='abc123')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['X-Request-ID'], 'abc123')
+
+        record = captured.records[0]
+        self.assertEqual(record.request_id, 'abc123')
+        self.assertEqual(record.view, 'color-list')
+        self.assertEqual(record.action, 'create')
+        self.assertEqual(record.status, 201)
+        self.assertGreater(record.queries, 0)
+
+        # Without a header, a request id is generated.
+        response = self.client.get(self.color_list_endpoint)
+        self.assertEqual(len(response['X-Request-ID']), 32)
+
+    def test_json_formatter(self):
+        """
+        Records are formatted as JSON with their extra fields.
+        """
+        record = logging.LogRecord('collectify.access', logging.INFO, __file__, 1, 'GET %s', ('/colors/',), None)
+        record.status = 200
+        logs.RequestContextFilter().filter(record)
+
+        data = json.loads(logs.JsonFormatter().format(record))
+
+        self.assertEqual(data['message'], 'GET /colors/')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['status'], 200)
+        self.assertIsNone(data['request_id'])
+        self.assertNotIn('args', data)
+
+    def test_queue_handler(self):
+        """
+        Records are written to the file by the listener thread.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            handler = logs.queue_handler(os.path.join(directory, 'test.{pid}.jsonl'))
+            handler.setFormatter(logs.JsonFormatter())
+
+            # Outside the "collectify" logger, whose handler would write the records as well.
+            logger = logging.getLogger('tests.logs')
+            logger.addHandler(handler)
+            try:
+                logger.warning('written %s', 'later', extra={'count': 2})
+            finally:
+                logger.removeHandler(handler)
+                logs.stop_listener(handler.listener)
+                handler.listener.handlers[0].close()
+
+            with open(os.path.join(directory, f'test.{os.getpid()}.jsonl')) as file:
+                lines = file.read().splitlines()
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['message'], 'written later')
+        self.assertEqual(json.loads(lines[0])['count'], 2)
+
+    def test_forked_process_file(self):
+        """
+        A forked process writes its records to a file of its own.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            handler = logs.queue_handler(os.path.join(directory, 'test.{pid}.jsonl'))
+            # Outside the "collectify" logger, whose handler would write the records as well.
+            logger = logging.getLogger('tests.logs')
+            logger.addHandler(handler)
+            try:
+                pid = os.fork()
+                if pid == 0:
+                    # The child writes its record and exits at once.
+                    logger.warning('written by the child')
+                    logs.stop_listener(handler.listener)
+                    os._exit(0)
+
+                os.waitpid(pid, 0)
+            finally:
+                logger.removeHandler(handler)
+                logs.stop_listener(handler.listener)
+                handler.listener.handlers[0].close()
+
+            with open(os.path.join(directory, f'test.{pid}.jsonl')) as file:
+                self.assertEqual(file.read().splitlines(), ['written by the child'])
+            self.assertFalse(os.path.exists(os.path.join(directory, f'test.{os.getpid()}.jsonl')))
@@ -0,0 +1,94 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from .. import metrics
+from ..catalogue import catalogue
+from ..models import User
+from .utils import AuthenticatedAPITestCase
+
+
+@override_settings(COLLECTIFY_METRICS_TOKEN='metrics_token')
+class MetricsTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create links.
+        self.metrics_endpoint = reverse('metrics')
+        self.color_list_endpoint = reverse('color-list')
+
+    def scrape(self, authorization):
+        self.client.credentials(HTTP_AUTHORIZATION=authorization)
+        return self.client.get(self.metrics_endpoint)
+
+    def test_metrics_token(self):
+        """
+        Metrics are only served with the metrics token.
+        """
+        self.assertEqual(self.scrape('Token ' + self.token.key).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.scrape('Bearer other_token').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.scrape('Bearer metrics_token').status_code, status.HTTP_200_OK)
+
+        # Without a token set, metrics are not served.
+        with self.settings(COLLECTIFY_METRICS_TOKEN=None):
+            self.assertEqual(self.scrape('Bearer None').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_request_metrics(self):
+        """
+        Requests are counted by view, action and status.
+        """
+        requests = metrics.REQUESTS.labels(view='color-list', action='create', method='POST', status=201)
+        count = requests._value.get()
+
+        # Create a color.
+        self.client.post(self.color_list_endpoint, {'name': 'bleu_test'}, format='json')
+
+        # The request should be counted once.
+        self.assertEqual(requests._value.get(), count + 1)
+
+        # Scrape the metrics.
+        response = self.scrape('Bearer metrics_token')
+        content = response.content.decode()
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Request counter should be exposed with its labels.
+        self.assertIn('collectify_requests_total{action="create",method="POST",status="201",view="color-list"}', content)
+        # Latency and query histograms should be exposed.
+        self.assertIn('collectify_request_latency_seconds_bucket{action="create"', content)
+        self.assertIn('collectify_request_db_queries_bucket{action="create"', content)
+
+    def test_cache_lookup_metrics(self):
+        """
+        Cache hits and misses are counted by cache name.
+        """
+        metrics.record_cache_lookup('test_cache', hits=3, misses=1)
+
+        # Hits and misses should be counted separately.
+        self.assertEqual(metrics.CACHE_LOOKUPS.labels(cache='test_cache', result='hit')._value.get(), 3)
+        self.assertEqual(metrics.CACHE_LOOKUPS.labels(cache='test_cache', result='miss')._value.get(), 1)
+
+    def test_cache_hit_ratios(self):
+        """
+        The representation, count and catalogue caches count their hits and misses.
+        """
+        def lookups(cache):
+            return [metrics.CACHE_LOOKUPS.labels(cache=cache, result=result)._value.get() for result in ('hit', 'miss')]
+
+        user = User.objects.create(firstname='Henry_test', lastname='Dupont_test', date_of_birth='1990-01-25')
+        representations, counts, catalogue_lookups = lookups('representations'), lookups('counts'), lookups('catalogue')
+        catalogue.reset()
+
+        # The first reads miss, the next ones hit; the list reuses the cached representation of the user.
+        for _ in range(2):
+            self.client.get(reverse('user-detail', args=[user.id]))
+            self.client.get(reverse('user-list'), {'page': 1})
+            self.client.get(reverse('catalogue'))
+
+        self.assertEqual(lookups('representations'), [representations[0] + 3, representations[1] + 1])
+        self.assertEqual(lookups('counts'), [counts[0] + 1, counts[1] + 1])
+        self.assertEqual(lookups('catalogue'), [catalogue_lookups[0] + 1, catalogue_lookups[1] + 1])
@@ -0,0 +1,66 @@
+from django.urls import reverse
+from rest_framework import status
+
+from ..models import CarHasColor, Color, Car, User
+from ..multiget import MAX_ID, MAX_IDS
+from .utils import AuthenticatedAPITestCase
+
+
+class MultiGetTest(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        '''
+        Create the objects shared by every test.
+        '''
+        super().setUpTestData()
+
+        # Create colors, cars and users.
+        cls.blue = Color.objects.create(name='bleu_test')
+        cls.cars = [Car.objects.create(name=f'Tesla_{index}') for index in range(3)]
+        for car in cls.cars:
+            CarHasColor.objects.create(car=car, color=cls.blue)
+        cls.users = [
+            User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=cls.cars[index], color=cls.blue)
+            for index in range(3)
+        ]
+
+    def test_multi_get_cars(self):
+        """
+        Cars are returned in the order of the ids, with null for the missing ones.
+        """
+        ids = [self.cars[2].id, self.cars[2].id + 1000, self.cars[0].id]
+
+        with self.assertNumQueries(4):
+            # Token, versions of the cars, cars missing from the cache and their colors.
+            response = self.client.get(reverse('car-list'), {'ids': ','.join(map(str, ids))})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([car and car['id'] for car in response.data], [self.cars[2].id, None, self.cars[0].id])
+        self.assertEqual(response.data[0]['colors'], [{'id': self.blue.id, 'name': 'bleu_test'}])
+
+    def test_multi_get_users_and_colors(self):
+        """
+        Users, with their expanded relations, and colors are retrieved by ids.
+        """
+        response = self.client.get(reverse('user-list'), {'ids': f'{self.users[1].id},{self.users[0].id}', 'expand': 'car'})
+        self.assertEqual([user['id'] for user in response.data], [self.users[1].id, self.users[0].id])
+        self.assertEqual(response.data[0]['car']['id'], self.cars[1].id)
+
+        response = self.client.get(reverse('color-list'), {'ids': [self.blue.id, self.blue.id]})
+        self.assertEqual([color['name'] for color in response.data], ['bleu_test', 'bleu_test'])
+
+    def test_invalid_ids(self):
+        """
+        Ids must be integers in the range of the ids, and at most MAX_IDS.
+        """
+        for ids in ['1,two', '1,0', '-1', str(MAX_ID + 1), '99999999999999999999999']:
+            response = self.client.get(reverse('car-list'), {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('car-list'), {'ids': str(MAX_ID)})
+        self.assertEqual(response.data, [None])
+
+        response = self.client.get(reverse('car-list'), {'ids': ','.join(map(str, range(MAX_IDS + 1)))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
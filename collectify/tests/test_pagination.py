@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework import status
+
+from ..models import Color, User
+from ..pagination import CachedCountPaginator
+from .utils import AuthenticatedAPITestCase
+
+
+class PaginationTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+        cache.clear()
+
+        # Create users.
+        self.users = [User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25')
+                      for index in range(5)]
+
+    def test_pages(self):
+        """
+        Lists are paginated when a page is requested.
+        """
+        colors = [Color.objects.create(name=f'color_{index}') for index in range(3)]
+
+        # Without page, the list should not be paginated.
+        self.assertEqual(len(self.client.get(reverse('color-list')).data), 3)
+
+        response = self.client.get(reverse('color-list'), {'page': 2, 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([color['id'] for color in response.data['results']], [colors[2].id])
+
+    @mock.patch.object(CachedCountPaginator, 'refresh_in_background', False)
+    def test_cached_count(self):
+        """
+        The count of users is cached, and counted again once stale.
+        """
+        first_page = self.client.get(reverse('user-list'), {'page_size': 2})
+        self.assertEqual(first_page.data['count'], 5)
+        self.assertEqual(len(first_page.data['results']), 2)
+
+        User.objects.create(firstname='John_test', lastname='Doe_test', date_of_birth='1978-07-16')
+
+        # The cached count should be returned.
+        self.assertEqual(self.client.get(reverse('user-list'), {'page_size': 2}).data['count'], 5)
+
+        # A stale count should be counted again.
+        with override_settings(COLLECTIFY_COUNT_CACHE_TTL=-1):
+            self.client.get(reverse('user-list'), {'page_size': 2})
+        self.assertEqual(self.client.get(reverse('user-list'), {'page_size': 2}).data['count'], 6)
@@ -0,0 +1,72 @@
+from django.urls import reverse
+from rest_framework import status
+
+from ..models import CarHasColor, Color, Car, User
+from .utils import AuthenticatedAPITestCase
+
+
+class RelationTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create colors, cars and users.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+        self.cars = [Car.objects.create(name=f'Tesla_{index}') for index in range(3)]
+        for car in self.cars[:2]:
+            CarHasColor.objects.create(car=car, color=self.blue)
+        CarHasColor.objects.create(car=self.cars[2], color=self.red)
+
+        self.drivers = [
+            User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=self.cars[0], color=self.blue)
+            for index in range(3)
+        ]
+        User.objects.create(firstname='John_test', lastname='Doe_test', date_of_birth='1978-07-16')
+
+    def test_color_cars(self):
+        """
+        The cars of a color are listed by pages.
+        """
+        response = self.client.get(reverse('color-cars', args=[self.blue.id]), {'page_size': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([car['id'] for car in response.data['results']], [self.cars[0].id])
+
+        # The next page should hold the second blue car only.
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual([car['id'] for car in next_page.data['results']], [self.cars[1].id])
+        self.assertEqual(next_page.data['results'][0]['colors'], [{'id': self.blue.id, 'name': 'bleu_test'}])
+
+        # Unknown colors should not be found.
+        self.assertEqual(self.client.get(reverse('color-cars', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_car_users(self):
+        """
+        The users of a car are listed with their expanded relations.
+        """
+        response = self.client.get(reverse('car-users', args=[self.cars[0].id]), {'expand': 'car,color'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['id'] for user in response.data['results']], [user.id for user in self.drivers])
+        self.assertEqual(response.data['results'][0]['car']['name'], 'Tesla_0')
+        self.assertEqual(response.data['results'][0]['color'], {'id': self.blue.id, 'name': 'bleu_test'})
+
+    def test_expand_users(self):
+        """
+        Expanded relations are loaded with one query per relation.
+        """
+        # Token, users, cars, colors of the cars and colors.
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('user-list'), {'expand': 'car,color'})
+
+        self.assertEqual(response.data[0]['car']['colors'], [{'id': self.blue.id, 'name': 'bleu_test'}])
+        self.assertIsNone(response.data[-1]['car'])
+
+        # Unknown relations should be rejected.
+        response = self.client.get(reverse('user-list'), {'expand': 'garage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
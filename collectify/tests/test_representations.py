@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework import status
+
+from ..models import CarHasColor, Color, Car, User
+from .. import representations
+from ..representations import get_representation_cache
+from .utils import AuthenticatedAPITestCase
+
+
+class RepresentationCacheTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+        get_representation_cache().clear()
+
+        # Create colors and a car.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+        self.tesla = self.client.post(reverse('car-list'), {'name': 'Tesla_test', 'colors': [{'name': 'bleu_test'}]},
+                                      format='json').data
+
+        # Create link.
+        self.tesla_endpoint = reverse('car-detail', args=[self.tesla['id']])
+
+    def test_cached_retrieve(self):
+        """
+        A car read again comes from the cache, until it or its colors are written.
+        """
+        self.client.get(self.tesla_endpoint)
+
+        # Only the version of the car should be read, after the token authentication.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.tesla_endpoint)
+        self.assertEqual(response.data, self.tesla)
+
+        # Link a color.
+        CarHasColor.objects.create(car_id=self.tesla['id'], color=self.red)
+        self.assertEqual(len(self.client.get(self.tesla_endpoint).data['colors']), 2)
+
+        # Rename a color.
+        self.client.put(reverse('color-detail', args=[self.red.id]), {'name': 'vermillon_test'}, format='json')
+        self.assertEqual(self.client.get(self.tesla_endpoint).data['colors'][1]['name'], 'vermillon_test')
+
+        # Delete the car.
+        self.client.delete(self.tesla_endpoint)
+        self.assertEqual(self.client.get(self.tesla_endpoint).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cached_list(self):
+        """
+        Lists are assembled from the cached objects and the objects read for the misses.
+        """
+        users = [User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25')
+                 for index in range(3)]
+        first_list = self.client.get(reverse('user-list')).data
+
+        # Update a user.
+        self.client.patch(reverse('user-detail', args=[users[1].id]), {'lastname': 'Martin_test'}, format='json')
+
+        # The list should keep its order and only read the updated user again.
+        with self.assertNumQueries(3):
+            second_list = self.client.get(reverse('user-list')).data
+
+        self.assertEqual([user['id'] for user in second_list], [user['id'] for user in first_list])
+        self.assertEqual([user['lastname'] for user in second_list], ['Dupont_test', 'Martin_test', 'Dupont_test'])
+
+    def test_batched_list(self):
+        """
+        The objects missing from the cache are read by batches.
+        """
+        users = [User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25')
+                 for index in range(5)]
+
+        # Token, versions and three batches of users.
+        with mock.patch.object(representations, 'REPRESENTATION_BATCH_SIZE', 2), self.assertNumQueries(5):
+            response = self.client.get(reverse('user-list'))
+
+        self.assertEqual([user['id'] for user in response.data], [user.id for user in users])
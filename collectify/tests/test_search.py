@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework import status
+
+from .. import search
+from ..models import Car, User
+from .utils import AuthenticatedAPITestCase
+
+
+class SearchTest(AuthenticatedAPITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        '''
+        Create the objects shared by every test.
+        '''
+        super().setUpTestData()
+
+        # Create users and cars.
+        for firstname, lastname in [('Henry', 'Dupontel'), ('Henry', 'Dupont'), ('Marie', 'Dupont'), ('John', 'Doe')]:
+            User.objects.create(firstname=firstname, lastname=lastname, date_of_birth='1990-01-25')
+        for name in ['Tesla Model 3', 'Tesla', 'Renault Clio']:
+            Car.objects.create(name=name)
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create links.
+        self.user_list_endpoint = reverse('user-list')
+        self.car_list_endpoint = reverse('car-list')
+
+    def search(self, endpoint, search):
+        response = self.client.get(endpoint, {'search': search})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_search_users(self):
+        """
+        Users contain every word of the search in their names, the most similar first.
+        """
+        names = [(user['firstname'], user['lastname']) for user in self.search(self.user_list_endpoint, 'dupont')]
+        # The exact last names should come before the longer one.
+        self.assertEqual(sorted(names[:2]), [('Henry', 'Dupont'), ('Marie', 'Dupont')])
+        self.assertEqual(names[2], ('Henry', 'Dupontel'))
+
+        # Words can match the first or the last name, and parts of them.
+        names = [(user['firstname'], user['lastname']) for user in self.search(self.user_list_endpoint, 'henry UPON')]
+        self.assertEqual(sorted(names), [('Henry', 'Dupont'), ('Henry', 'Dupontel')])
+
+        # Short words match the start of the names.
+        names = [(user['firstname'], user['lastname']) for user in self.search(self.user_list_endpoint, 'jo')]
+        self.assertEqual(names, [('John', 'Doe')])
+        self.assertEqual(self.search(self.user_list_endpoint, 'hn'), [])
+
+    def test_search_cars(self):
+        """
+        Cars contain every word of the search in their name, the most similar first.
+        """
+        names = [car['name'] for car in self.search(self.car_list_endpoint, 'tesla')]
+        self.assertEqual(names, ['Tesla', 'Tesla Model 3'])
+
+        # Without search, every car is listed.
+        self.assertEqual(len(self.search(self.car_list_endpoint, '')), 3)
+
+        # Paginated searches count their results.
+        response = self.client.get(self.car_list_endpoint, {'search': 'clio', 'page': 1})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['name'], 'Renault Clio')
+
+    def test_search_cap(self):
+        """
+        Searches matching too many rows return their most similar matches.
+        """
+        # 'Tesla' is created after 'Tesla Model 3', capping the matches by id would drop it.
+        with mock.patch.object(search, 'MAX_SEARCH_RESULTS', 1):
+            names = [car['name'] for car in self.search(self.car_list_endpoint, 'tesla')]
+        self.assertEqual(names, ['Tesla'])
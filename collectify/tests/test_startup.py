@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from ..management.commands.startup_report import get_package_import_times
+
+
+class StartupReportTest(SimpleTestCase):
+
+    def test_package_import_times(self):
+        """
+        Sum the self import time of the modules of each top-level package.
+        """
+        output = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:      1500 |       1500 |   django.utils',
+            'import time:       500 |       2000 | django',
+            'import time:      3000 |       3000 | rest_framework.views',
+            'import time:        20 |         20 |     json',
+        ])
+
+        # Packages should be sorted by import time, in milliseconds.
+        self.assertEqual(get_package_import_times(output), [('rest_framework', 3.0), ('django', 2.0), ('json', 0.02)])
@@ -0,0 +1,89 @@
+import os
+import tempfile
+
+from django.urls import reverse
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+
+from ..throttling import SharedMemoryBucketStore
+from .utils import AuthenticatedAPITestCase
+
+
+class SharedMemoryBucketStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'buckets')
+
+    def test_buckets_are_shared(self):
+        """
+        Stores mapping the same file share their buckets.
+        """
+        first_store = SharedMemoryBucketStore(self.path, slots=16)
+        second_store = SharedMemoryBucketStore(self.path, slots=16)
+
+        # The bucket should allow a burst of 2 requests.
+        self.assertEqual(first_store.consume('token:a', 2, 0.1), 0)
+        self.assertEqual(second_store.consume('token:a', 2, 0.1), 0)
+        # The third request should wait for the bucket to refill.
+        self.assertGreater(first_store.consume('token:a', 2, 0.1), 0)
+        # Other keys should have their own bucket.
+        self.assertEqual(second_store.consume('token:b', 2, 0.1), 0)
+
+    def test_full_table_evicts_buckets(self):
+        """
+        A store with fewer slots than keys keeps working.
+        """
+        store = SharedMemoryBucketStore(self.path, slots=2)
+
+        for index in range(10):
+            # Every new key should get a full bucket.
+            self.assertEqual(store.consume(f'token:{index}', 1, 0.1), 0)
+
+
+@override_settings(COLLECTIFY_THROTTLE_STORE={'BACKEND': 'collectify.throttling.LocalMemoryBucketStore'})
+class ThrottlingTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create link.
+        self.color_list_endpoint = reverse('color-list')
+
+    def rest_framework_settings(self, rates):
+        from django.conf import settings
+
+        return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+
+    def test_token_rate(self):
+        """
+        Requests over the rate of a token are refused.
+        """
+        with self.settings(REST_FRAMEWORK=self.rest_framework_settings({'token': '2/min'})):
+            responses = [self.client.get(self.color_list_endpoint) for _ in range(3)]
+
+        # The first requests should be allowed.
+        self.assertEqual([response.status_code for response in responses[:2]], [status.HTTP_200_OK] * 2)
+        # The third request should be throttled with the time to wait.
+        self.assertEqual(responses[2].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', responses[2])
+
+    def test_action_rate(self):
+        """
+        Each action has its own bucket and rate.
+        """
+        with self.settings(REST_FRAMEWORK=self.rest_framework_settings({'action': '5/min', 'color-list': '1/min'})):
+            list_responses = [self.client.get(self.color_list_endpoint) for _ in range(2)]
+            create_response = self.client.post(self.color_list_endpoint, {'name': 'bleu_test'}, format='json')
+
+        # The list action should be throttled at its own rate.
+        self.assertEqual(list_responses[1].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # The create action should use the default action rate.
+        self.assertEqual(create_response.status_code, status.HTTP_201_CREATED)
@@ -1,15 +1,15 @@
 import datetime
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.contrib.auth.models import User as AuthUser
-from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
 from rest_framework import status
 
 from ..models import Car, Color, User
+from .utils import AuthenticatedAPITestCase
 
 # Create your tests here.
-class UserTest(APITestCase):
+class UserTest(AuthenticatedAPITestCase):
 
     def assertCreateUser(self, response):
         # Response status code should be 201.
@@ -39,10 +39,7 @@ class UserTest(APITestCase):
         '''
         Prepare variables needed by every test.
         '''
-        # Authenticate.
-        self.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
-        self.token = Token.objects.create(user=self.authUser)
-        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        super().setUp()
 
         # Prepare user data.
         self.required_data = {
@@ -230,6 +227,36 @@ class UserTest(APITestCase):
         # Database user should have a color.
         self.assertEqual(User.objects.first().color_id, Color.objects.first().id)
 
+    def test_update_user_changed_fields(self):
+        """
+        Updates only write the changed fields, and nothing when no field changed.
+        """
+        # Create a user.
+        create_response = self.client.post(self.user_list_endpoint, self.required_data, format='json')
+        user_detail_endpoint = reverse('user-detail', args=[create_response.data['id']])
+        updated_at = User.objects.get().updated_at
+
+        # Send the same data again.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(user_detail_endpoint, self.required_data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The user should not be written.
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "collectify_users"')])
+        self.assertEqual(User.objects.get().updated_at, updated_at)
+
+        # Change the last name.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(user_detail_endpoint, {'lastname': 'Doe_test'}, format='json')
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "collectify_users"')]
+        # Only the last name and the update time should be written.
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"lastname"', updates[0])
+        self.assertNotIn('"firstname"', updates[0])
+        self.assertEqual(User.objects.get().lastname, 'Doe_test')
+        self.assertGreater(User.objects.get().updated_at, updated_at)
+
     def test_remove_user_licence(self):
         """
         Remove driver licence from user.
@@ -0,0 +1,145 @@
+import datetime
+
+from django.urls import reverse
+from rest_framework import status
+
+from ..models import CarHasColor, Color, Car, User
+from .utils import AuthenticatedAPITestCase
+
+
+class UserBulkTest(AuthenticatedAPITestCase):
+
+    def setUp(self):
+        '''
+        Prepare variables needed by every test.
+        '''
+        super().setUp()
+
+        # Create colors and cars.
+        self.blue = Color.objects.create(name='bleu_test')
+        self.red = Color.objects.create(name='rouge_test')
+        self.tesla = Car.objects.create(name='Tesla_test')
+        self.bmw = Car.objects.create(name='BMW_test')
+        CarHasColor.objects.create(car=self.tesla, color=self.blue)
+        CarHasColor.objects.create(car=self.bmw, color=self.red)
+
+        # Create users with and without driver licence.
+        self.drivers = [
+            User.objects.create(firstname=f'Henry_{index}', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                has_driver_licence=True, car=self.tesla, color=self.blue)
+            for index in range(3)
+        ]
+        self.walker = User.objects.create(firstname='John_test', lastname='Doe_test', date_of_birth='1978-07-16')
+
+        # Create link.
+        self.bulk_endpoint = reverse('user-bulk')
+
+    def test_revoke_driver_licence(self):
+        """
+        Revoke the driver licence of a list of users.
+        """
+        ids = [user.id for user in self.drivers[:2]]
+        response = self.client.patch(self.bulk_endpoint, {'ids': ids, 'data': {'has_driver_licence': False}}, format='json')
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 2})
+        # Users without driver licence should not have a car nor a color.
+        self.assertEqual(User.objects.filter(id__in=ids, has_driver_licence=False, car=None, color=None).count(), 2)
+        # Other users should not change.
+        self.assertEqual(User.objects.get(id=self.drivers[2].id).car_id, self.tesla.id)
+
+    def test_change_car_by_filter(self):
+        """
+        Change the car of the users filtered by car.
+        """
+        data = {'filter': {'car_id': self.tesla.id}, 'data': {'car_id': self.bmw.id}}
+        response = self.client.patch(self.bulk_endpoint, data, format='json')
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 3})
+        # Users should have the new car, without the color the new car does not have.
+        self.assertEqual(User.objects.filter(car=self.bmw, color=None).count(), 3)
+
+    def test_change_color_of_users_with_and_without_licence(self):
+        """
+        Change names and color of users, the color is only given to drivers whose car has it.
+        """
+        ids = [self.drivers[0].id, self.walker.id]
+        data = {'ids': ids, 'data': {'lastname': 'Smith_test', 'color_id': self.red.id}}
+        response = self.client.patch(self.bulk_endpoint, data, format='json')
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 2})
+        # Every selected user should have the new name.
+        self.assertEqual(User.objects.filter(lastname='Smith_test').count(), 2)
+        # The color is not one of the car colors.
+        self.assertEqual(User.objects.get(id=self.drivers[0].id).color_id, None)
+        # A user without driver licence should not get a color.
+        self.assertEqual(User.objects.get(id=self.walker.id).color_id, None)
+        self.assertEqual(User.objects.get(id=self.walker.id).date_of_birth, datetime.date(1978, 7, 16))
+
+    def test_bulk_requires_selection(self):
+        """
+        Refuse a bulk request without ids nor filter.
+        """
+        response = self.client.patch(self.bulk_endpoint, {'data': {'has_driver_licence': False}}, format='json')
+
+        # Response status code should be 400.
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Users should not change.
+        self.assertEqual(User.objects.filter(has_driver_licence=True).count(), 3)
+
+    def test_bulk_delete(self):
+        """
+        Delete the users filtered by driver licence.
+        """
+        response = self.client.delete(self.bulk_endpoint, {'filter': {'has_driver_licence': True}}, format='json')
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'deleted': 3})
+        # Only the user without driver licence should remain.
+        self.assertEqual(list(User.objects.all()), [self.walker])
+
+    def test_change_color_of_drivers_without_car(self):
+        """
+        Drivers without a car keep the color they are given, as when they are updated one by one.
+        """
+        pedestrian = User.objects.create(firstname='Marie_test', lastname='Dupont_test', date_of_birth='1990-01-25',
+                                         has_driver_licence=True)
+        data = {'ids': [pedestrian.id, self.drivers[0].id], 'data': {'color_id': self.red.id}}
+        response = self.client.patch(self.bulk_endpoint, data, format='json')
+
+        # Response status code should be 200.
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.get(id=pedestrian.id).color_id, self.red.id)
+        self.assertEqual(User.objects.get(id=self.drivers[0].id).color_id, None)
+
+        # Removing the car of drivers keeps the color given with it.
+        data = {'ids': [self.drivers[1].id], 'data': {'car_id': None, 'color_id': self.red.id}}
+        response = self.client.patch(self.bulk_endpoint, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.filter(id=self.drivers[1].id, car=None, color=self.red).count(), 1)
+
+        # The same update of a single user gives the same result.
+        response = self.client.patch(reverse('user-detail', args=[self.drivers[2].id]),
+                                     {'car_id': None, 'color_id': self.red.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.filter(id=self.drivers[2].id, car=None, color=self.red).count(), 1)
+
+    def test_remove_car_of_drivers(self):
+        """
+        Removing the car of drivers keeps their color, as when they are updated one by one.
+        """
+        data = {'ids': [self.drivers[0].id], 'data': {'car_id': None}}
+        response = self.client.patch(self.bulk_endpoint, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(reverse('user-detail', args=[self.drivers[1].id]), {'car_id': None}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for user in self.drivers[:2]:
+            self.assertEqual(User.objects.filter(id=user.id, car=None, color=self.blue).count(), 1)
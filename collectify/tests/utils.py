@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth.models import User as AuthUser
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from ..changes import get_committed_position
+from ..models import Change
+
+
+def wait_for_older_transactions(timeout=30):
+    """
+    Wait until every recorded change can be read from the change feed.
+    On PostgreSQL, the transactions of other test processes hold the changes back until they end.
+    """
+    position = get_committed_position()
+    deadline = time.monotonic() + timeout
+
+    while position is not None and Change.objects.filter(transaction_id__gte=position).exists():
+        if time.monotonic() > deadline:
+            raise AssertionError('Changes are still held back by older transactions.')
+        time.sleep(0.05)
+
+
+class AuthenticatedAPITestCase(APITestCase):
+    """
+    API test case whose client is authenticated with the token of a superuser
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        '''
+        Create the superuser and the token of the client.
+        '''
+        cls.authUser = AuthUser.objects.create_superuser('test_user', '', 'test_password')
+        cls.token = Token.objects.create(user=cls.authUser)
+
+    def setUp(self):
+        '''
+        Authenticate the client.
+        '''
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
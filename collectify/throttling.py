@@ -0,0 +1,223 @@
+"""
+Token bucket throttles keyed by authentication token.
+
+Buckets live in a store shared by the gunicorn workers of a host, so that the
+rate of a client does not depend on the worker answering it. The store is set
+by COLLECTIFY_THROTTLE_STORE:
+
+    COLLECTIFY_THROTTLE_STORE = {
+        'BACKEND': 'collectify.throttling.SharedMemoryBucketStore',
+        'OPTIONS': {'path': '/dev/shm/collectify-throttle', 'slots': 65536},
+    }
+"""
+
+import fcntl
+import functools
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def get_key_hash(key):
+    """
+    Return a non-zero 64 bits hash of a bucket key
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+
+def take_token(tokens, updated, capacity, refill_rate, now):
+    """
+    Refill a bucket and take a token from it.
+    Return the new number of tokens and the seconds to wait, 0 if the token was taken.
+    """
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+    if tokens >= 1:
+        return tokens - 1, 0.0
+
+    return tokens, (1 - tokens) / refill_rate
+
+
+class LocalMemoryBucketStore:
+    """
+    Buckets of the current process only, for development and tests
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.time()
+
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated, capacity, refill_rate, now)
+            self.buckets[key] = (tokens, now)
+
+        return wait
+
+
+class SharedMemoryBucketStore:
+    """
+    Buckets in a memory-mapped file shared by the processes of a host.
+
+    The file is a fixed-size open addressing hash table of (key hash, tokens,
+    last update) slots, locked with flock for the few microseconds of an update.
+    When the probed slots are all used, the least recently updated bucket is evicted.
+    """
+    slot = struct.Struct('<Qdd')
+    probes = 8
+
+    def __init__(self, path=None, slots=65536):
+        default_directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        self.path = path or os.path.join(default_directory, 'collectify-throttle')
+        self.slots = slots
+        self.pid = None
+
+    def open(self):
+        """
+        Map the file, once per process because the mapping is not shared with forked workers
+        """
+        if self.pid == os.getpid():
+            return
+
+        size = self.slots * self.slot.size
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size != size:
+                os.ftruncate(self.fd, size)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        self.map = mmap.mmap(self.fd, size)
+        self.pid = os.getpid()
+
+    def consume(self, key, capacity, refill_rate):
+        self.open()
+        key_hash = get_key_hash(key)
+        first = key_hash % self.slots
+
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            tokens, updated = capacity, now
+            target = None
+            oldest = None
+
+            for probe in range(self.probes):
+                offset = ((first + probe) % self.slots) * self.slot.size
+                slot_hash, slot_tokens, slot_updated = self.slot.unpack_from(self.map, offset)
+
+                if slot_hash == key_hash:
+                    target, tokens, updated = offset, slot_tokens, slot_updated
+                    break
+                if slot_hash == 0:
+                    target = offset
+                    break
+                if oldest is None or slot_updated < oldest[1]:
+                    oldest = (offset, slot_updated)
+
+            if target is None:
+                target = oldest[0]
+
+            tokens, wait = take_token(tokens, updated, capacity, refill_rate, now)
+            self.slot.pack_into(self.map, target, key_hash, tokens, now)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        return wait
+
+
+@functools.lru_cache(maxsize=None)
+def get_bucket_store():
+    """
+    Return the bucket store set by COLLECTIFY_THROTTLE_STORE
+    """
+    config = getattr(settings, 'COLLECTIFY_THROTTLE_STORE', {})
+    backend = import_string(config.get('BACKEND', 'collectify.throttling.SharedMemoryBucketStore'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_bucket_store(setting, **kwargs):
+    if setting == 'COLLECTIFY_THROTTLE_STORE':
+        get_bucket_store.cache_clear()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Throttle allowing bursts of "num" requests, refilled at "num" requests per period.
+    Rates are read from DEFAULT_THROTTLE_RATES for the scope of the request.
+    """
+
+    def __init__(self):
+        self.wait_time = 0
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_ident(self, request):
+        """
+        Identify clients by their token, and anonymous clients by their address
+        """
+        token = getattr(request.auth, 'key', None)
+        return f'token:{token}' if token else f'ip:{super().get_ident(request)}'
+
+    def get_cache_key(self, request, view):
+        return f'{self.scope}:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(view)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+
+        capacity, duration = self.parse_rate(self.rate)
+        self.wait_time = get_bucket_store().consume(self.get_cache_key(request, view), capacity, capacity / duration)
+
+        return self.wait_time == 0
+
+    def wait(self):
+        return self.wait_time
+
+
+class TokenRateThrottle(TokenBucketThrottle):
+    """
+    Limit every token to the "token" rate over all endpoints
+    """
+    scope = 'token'
+
+
+class TokenActionRateThrottle(TokenBucketThrottle):
+    """
+    Limit every token on each viewset action.
+    The rate of the "<basename>-<action>" scope (e.g. "user-create") is used,
+    or the "action" rate when the action has no rate of its own.
+    """
+    default_scope = 'action'
+
+    def get_scope(self, view):
+        basename = getattr(view, 'basename', None)
+        action = getattr(view, 'action', None)
+        return f'{basename}-{action}' if basename and action else self.default_scope
+
+    def get_rate(self):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        return rates.get(self.scope, rates.get(self.default_scope))
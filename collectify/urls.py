@@ -1,15 +1,19 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import catalogue, metrics, views
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
 router.register(r'users', views.UserViewSet)
 router.register(r'cars', views.CarViewSet)
 router.register(r'colors', views.ColorViewSet)
+router.register(r'changes', views.ChangeViewSet)
+router.register(r'jobs', views.JobViewSet)
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
     path('', include(router.urls)),
+    path('catalogue/', catalogue.CatalogueView.as_view(), name='catalogue'),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
@@ -1,32 +1,208 @@
-from rest_framework import authtoken, permissions, viewsets
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import authtoken, mixins, permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-from .models import CarHasColor, Color, Car, User
-from .serializers import ColorSerializer, CarSerializer, UserSerializer
+from .changes import change_batch, get_changes_after
+from .deletions import AsyncDestroyMixin
+from .idempotency import IdempotentMixin
+from .models import CarHasColor, Change, Color, Car, Job, User
+from .multiget import MultiGetMixin
+from .pagination import RelationPagination
+from .representations import CachedRepresentationMixin
+from .search import TrigramSearchFilter
+from .serializers import (
+    ChangeQuerySerializer, ColorSerializer, CarSerializer, DenormalizedCarSerializer, JobSerializer, UserBulkSerializer,
+    UserSerializer, expand_users, get_user_expand,
+)
 
 
 # Create your views here.
-class ColorViewSet(viewsets.ModelViewSet):
+class ColorViewSet(IdempotentMixin, AsyncDestroyMixin, MultiGetMixin, viewsets.ModelViewSet):
     """
-    List, create, retrieve, update and delete colors
+    List, create, retrieve, update and delete colors, in the background with DELETE ...?async=true.
+    Retrieve many colors with ?ids=1,2,3.
     """
     queryset = Color.objects.all()
     serializer_class = ColorSerializer
     permission_classes = [permissions.IsAuthenticated]
+    count_strategy = 'exact'
 
+    @action(detail=True, methods=['get'], serializer_class=CarSerializer, pagination_class=RelationPagination)
+    def cars(self, request, pk=None):
+        """
+        List the cars painted in a color
+        """
+        color = get_object_or_404(Color, pk=pk)
+        cars = Car.objects.filter(id__in=CarHasColor.objects.filter(color=color).values('car_id')).prefetch_related('colors')
 
-class CarViewSet(viewsets.ModelViewSet):
+        page = self.paginate_queryset(cars)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class CarViewSet(IdempotentMixin, AsyncDestroyMixin, MultiGetMixin, CachedRepresentationMixin, viewsets.ModelViewSet):
     """
-    List, create, retrieve, update and delete cars
+    List, create, retrieve, update and delete cars, in the background with DELETE ...?async=true.
+    Search cars by parts of their name with ?search=, retrieve many cars with ?ids=1,2,3.
     """
     queryset = Car.objects.all()
     serializer_class = CarSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ['name']
+    count_strategy = 'estimated'
+
+    def reads_denormalized_colors(self):
+        """
+        Return True if the colors are read from the color list stored on cars
+        """
+        return self.action in ('list', 'retrieve') and getattr(settings, 'COLLECTIFY_DENORMALIZED_CAR_COLORS', False)
+
+    def get_queryset(self):
+        if self.reads_denormalized_colors():
+            return Car.objects.all()
+
+        return Car.objects.prefetch_related('colors')
+
+    def get_serializer_class(self):
+        if self.reads_denormalized_colors():
+            return DenormalizedCarSerializer
+
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['get'], serializer_class=UserSerializer, pagination_class=RelationPagination)
+    def users(self, request, pk=None):
+        """
+        List the users driving a car, with the relations given by ?expand=car,color
+        """
+        car = get_object_or_404(Car.objects.only('id'), pk=pk)
+        expand = get_user_expand(request.query_params)
+        users = expand_users(User.objects.filter(car=car), expand)
+
+        page = self.paginate_queryset(users)
+        context = dict(self.get_serializer_context(), expand=expand)
+        return self.get_paginated_response(UserSerializer(page, many=True, context=context).data)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(IdempotentMixin, MultiGetMixin, CachedRepresentationMixin, viewsets.ModelViewSet):
     """
-    List, create, retrieve, update and delete users
+    List, create, retrieve, update and delete users.
+    Search users by parts of their first and last names with ?search=, retrieve many users with ?ids=1,2,3.
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ['firstname', 'lastname']
+    count_strategy = 'cached'
+
+    def get_expand(self):
+        """
+        Return the relations to expand, given as ?expand=car,color
+        """
+        if not hasattr(self, 'expand'):
+            self.expand = get_user_expand(self.request.query_params)
+        return self.expand
+
+    def uses_representation_cache(self):
+        # Expanded users change with their car and color, they are not cached.
+        return not self.get_expand()
+
+    def get_queryset(self):
+        return expand_users(User.objects.all(), self.get_expand())
+
+    def get_serializer_context(self):
+        return dict(super().get_serializer_context(), expand=self.get_expand())
+
+    @action(detail=False, methods=['patch', 'delete'], url_path='bulk', url_name='bulk', serializer_class=UserBulkSerializer)
+    def bulk(self, request):
+        """
+        Update or delete the users selected by "ids" and/or "filter" with set-based statements
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if request.method == 'DELETE':
+            with transaction.atomic(), change_batch():
+                deleted, _ = serializer.get_queryset().delete()
+            return Response({'deleted': deleted})
+
+        return Response({'updated': serializer.update_users()})
+
+
+class ChangeViewSet(viewsets.GenericViewSet):
+    """
+    List the saves and deletions of users, cars and colors after a cursor, in commit order.
+    Saved objects come with their current data, deleted ones as tombstones.
+    """
+    queryset = Change.objects.all()
+    serializer_class = ChangeQuerySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    # Queryset and serializer giving the data of the saved objects of every model.
+    feed_serializers = {
+        'user': (User.objects.all(), UserSerializer),
+        'car': (Car.objects.prefetch_related('colors'), CarSerializer),
+        'color': (Color.objects.all(), ColorSerializer),
+    }
+
+    def list(self, request):
+        query = self.get_serializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        transaction_id, change_id = query.validated_data['since']
+        limit = query.validated_data['limit']
+
+        changes = list(get_changes_after(transaction_id, change_id)[:limit + 1])
+        more = len(changes) > limit
+        changes = changes[:limit]
+
+        if changes:
+            transaction_id, change_id = changes[-1].transaction_id, changes[-1].id
+
+        return Response({
+            'next': f'{transaction_id}.{change_id}',
+            'more': more,
+            'results': self.get_results(changes),
+        })
+
+    def get_results(self, changes):
+        """
+        Return the last change of every object, with the data of the saved objects
+        """
+        last_changes = {}
+        for change in changes:
+            last_changes.pop((change.model, change.object_id), None)
+            last_changes[(change.model, change.object_id)] = change
+
+        data = {}
+        for model, (queryset, serializer_class) in self.feed_serializers.items():
+            ids = [object_id for (name, object_id), change in last_changes.items()
+                   if name == model and change.action == Change.SAVE]
+            if ids:
+                objects = queryset.filter(id__in=ids)
+                data.update(((model, item['id']), item) for item in serializer_class(objects, many=True).data)
+
+        results = []
+        for key, change in last_changes.items():
+            # An object deleted since its save is returned as a tombstone.
+            item = data.get(key)
+            results.append({
+                'model': change.model,
+                'id': change.object_id,
+                'action': Change.SAVE if item else Change.DELETE,
+                'changed_at': change.changed_at,
+                'data': item,
+            })
+
+        return results
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Retrieve the status, progress and result of a background job
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
@@ -2,6 +2,7 @@
 ASGI config for collectify_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to /events/ are streamed by collectify.events, the others go to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +14,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'collectify_api.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up.
+from collectify.events import EventStream  # noqa: E402
+
+event_stream = EventStream()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/events/':
+        return await event_stream(scope, receive, send)
+
+    return await django_application(scope, receive, send)
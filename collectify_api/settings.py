@@ -13,7 +13,6 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 import os
 from pathlib import Path
 from urllib.parse import urlparse
-import django_heroku
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -56,10 +55,58 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
-    ]
+    ],
+    # Lists are paginated when requested with ?page or ?page_size, see collectify.pagination.
+    "DEFAULT_PAGINATION_CLASS": "collectify.pagination.CountedPageNumberPagination",
+    "DEFAULT_THROTTLE_CLASSES": [
+        "collectify.throttling.TokenRateThrottle",
+        "collectify.throttling.TokenActionRateThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        # Every token over all endpoints.
+        "token": "6000/min",
+        # Every token on each viewset action, unless the action has its own rate ("<basename>-<action>").
+        "action": "3000/min",
+        "user-bulk": "60/min",
+    },
+}
+
+# Token buckets shared by the workers of a host.
+COLLECTIFY_THROTTLE_STORE = {
+    'BACKEND': 'collectify.throttling.SharedMemoryBucketStore',
+    'OPTIONS': {
+        'slots': 65536,
+    },
+}
+
+# Serialized cars and users, see collectify.representations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'representations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'collectify-representations',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+COLLECTIFY_REPRESENTATION_CACHE = 'representations'
+
+# Seconds during which the cached count of a paginated list is used before being counted again.
+COLLECTIFY_COUNT_CACHE_TTL = 60
+
+# Broker of the /events/ stream, PostgresBroker reaches the streams of every process.
+COLLECTIFY_EVENT_BROKER = {
+    'BACKEND': 'collectify.events.LocalBroker',
 }
 
 MIDDLEWARE = [
+    ####    METRICS             ####
+    'collectify.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,7 +128,80 @@ CORS_ALLOWED_ORIGINS = [
     "https://collectify-admin.herokuapp.com",
 ]
 
-DRF_API_LOGGER_DATABASE = True,
+# Serve car lists and details from the color list stored on cars, without joining their colors.
+# Run "python3 manage.py repair_car_colors" before enabling it on existing data.
+COLLECTIFY_DENORMALIZED_CAR_COLORS = False
+
+# Responses replayed to the retries of requests sent with an Idempotency-Key header, in seconds.
+COLLECTIFY_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Seconds after which the key of a request still running, e.g. killed with its worker, can be claimed by a retry.
+COLLECTIFY_IDEMPOTENCY_LEASE = 60
+
+# Seconds during which /catalogue/ is served from memory without checking for changes (see collectify.catalogue).
+COLLECTIFY_CATALOGUE_CHECK_INTERVAL = 1
+
+DRF_API_LOGGER_DATABASE = True
+
+# Bearer token sent by Prometheus to scrape /metrics, which is refused while it is not set.
+COLLECTIFY_METRICS_TOKEN = os.environ.get('COLLECTIFY_METRICS_TOKEN')
+
+# Metrics scrapes are not logged, and only this share of the successful GET requests is (see collectify.apilogs).
+DRF_API_LOGGER_SKIP_URL_NAME = ['metrics']
+DRF_API_LOGGER_POLICY_FUNC = 'collectify.apilogs.logging_policy'
+COLLECTIFY_API_LOG_GET_SAMPLE_RATE = 0.1
+
+# Days of API logs kept by `manage.py prune_api_logs`.
+COLLECTIFY_API_LOG_RETENTION_DAYS = 30
+
+# Days of changes kept in the change feed by `manage.py prune_changes`.
+COLLECTIFY_CHANGE_RETENTION_DAYS = 7
+
+# JSON lines written by a queue listener thread of every process to stderr, or to COLLECTIFY_LOG_FILE, see collectify.logs.
+# "{pid}" is replaced by the process id, rotation is "size" (COLLECTIFY_LOG_MAX_BYTES) or "time" (every midnight).
+COLLECTIFY_LOG_FILE = os.environ.get('COLLECTIFY_LOG_FILE')
+COLLECTIFY_LOG_ROTATION = os.environ.get('COLLECTIFY_LOG_ROTATION', 'size')
+COLLECTIFY_LOG_MAX_BYTES = 50 * 1024 * 1024
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request': {
+            '()': 'collectify.logs.RequestContextFilter',
+        },
+    },
+    'formatters': {
+        'json': {
+            '()': 'collectify.logs.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'collectify.logs.queue_handler',
+            'filename': COLLECTIFY_LOG_FILE,
+            'rotation': COLLECTIFY_LOG_ROTATION,
+            'max_bytes': COLLECTIFY_LOG_MAX_BYTES,
+            'backup_count': 5,
+            'formatter': 'json',
+            'filters': ['request'],
+        },
+    },
+    'loggers': {
+        # Access log of every request ("collectify.access") and messages of the app.
+        'collectify': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # Errors of the requests, with their traceback.
+        'django.request': {
+            'handlers': ['queue'],
+            'level': 'ERROR',
+            'propagate': False,
+        },
+    },
+}
 
 ROOT_URLCONF = 'collectify_api.urls'
 
@@ -171,5 +291,7 @@ WHITENOISE_USE_FINDERS = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Activate Django-Heroku.
-django_heroku.settings(locals()) # Comment this line to use locally
+# Activate Django-Heroku, unless a settings profile configures the deployment itself.
+if os.environ.get('DJANGO_HEROKU', 'true') == 'true':
+    import django_heroku
+    django_heroku.settings(locals(), logging=False) # Comment this line to use locally
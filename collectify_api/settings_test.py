@@ -0,0 +1,48 @@
+"""
+Django settings of the test suite.
+
+Test users are created with a fast password hasher instead of PBKDF2, and
+django_heroku, which replaces the test runner, is left out. Run the suite on
+PostgreSQL, with a database per process:
+
+    python3 manage.py test --settings=collectify_api.settings_test --parallel
+
+or on an in-memory SQLite database, e.g. without a PostgreSQL server:
+
+    TEST_DATABASE=sqlite python3 manage.py test --settings=collectify_api.settings_test --parallel
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_HEROKU', 'false')
+os.environ.setdefault('SECRET_KEY', 'collectify-tests')
+
+if os.environ.get('TEST_DATABASE') == 'sqlite':
+    os.environ.setdefault('DATABASE_URL', 'postgres://localhost/collectify')
+
+from .settings import *  # noqa: E402,F401,F403
+
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+# Buckets of the test process, not shared through /dev/shm with other test runs or servers of the host.
+COLLECTIFY_THROTTLE_STORE = {
+    'BACKEND': 'collectify.throttling.LocalMemoryBucketStore',
+}
+
+# The API logger writes from its own thread, outside the test transactions, and keeps the test database open.
+DRF_API_LOGGER_DATABASE = False
+
+if os.environ.get('TEST_DATABASE') == 'sqlite':
+    # Every test process gets its own copy of the in-memory database.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
+    }
+
+# The access log of every request would flood the output of the tests, which only log warnings and errors.
+LOGGING['loggers']['collectify']['level'] = 'WARNING'  # noqa: F405
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for collectify_api.
+
+Every worker writes its Prometheus samples in PROMETHEUS_MULTIPROC_DIR so that
+the /metrics endpoint can aggregate them, whichever worker answers the scrape.
+"""
+
+import os
+import shutil
+import tempfile
+
+# The directory must be known before prometheus_client is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'collectify-prometheus'))
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """
+    Remove samples left by a previous master before forking the workers.
+    """
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """
+    Tell prometheus_client that the samples of a dead worker can be merged.
+    """
+    multiprocess.mark_process_dead(worker.pid)
@@ -8,7 +8,24 @@ import sys
 from django.core.exceptions import ImproperlyConfigured
 
 
+# Settings giving their own default to the required variables.
+SELF_CONFIGURED_SETTINGS = [ 'collectify_api.settings_test' ]
+
+
+def get_settings_module(argv):
+    for index, arg in enumerate(argv):
+        if arg.startswith('--settings='):
+            return arg.split('=', 1)[1]
+        if arg == '--settings' and index + 1 < len(argv):
+            return argv[index + 1]
+
+    return os.environ.get('DJANGO_SETTINGS_MODULE')
+
+
 def check_environment():
+    if get_settings_module(sys.argv) in SELF_CONFIGURED_SETTINGS:
+        return
+
     required_environment_variables = [ 'DATABASE_URL', 'SECRET_KEY' ]
 
     for name in required_environment_variables: